@@ -0,0 +1,44 @@
+"""Add user token digest
+
+Revision ID: 31e5943ee3a4
+Revises: 632787abe42c
+Create Date: 2026-10-18 15:41:02.925934
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+from loguru import logger
+import sqlalchemy as sa
+
+from src.core.secure import decrypt_token, token_digest
+
+
+# revision identifiers, used by Alembic.
+revision: str = '31e5943ee3a4'
+down_revision: Union[str, None] = '632787abe42c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('user', sa.Column('token_digest', sa.CHAR(length=64), nullable=True))
+
+    # Digests are keyed with ENCRYPTION_KEY, so they can only be computed here, not in SQL
+    connection = op.get_bind()
+    rows = connection.execute(sa.text('SELECT id, token FROM "user"')).all()
+    digests = []
+    for id, token in rows:
+        try:
+            digests.append({"id": id, "digest": token_digest(decrypt_token(token))})
+        except ValueError:
+            logger.warning(f"Token of client {id} cannot be decrypted, its digest is left empty")
+    if digests:
+        connection.execute(sa.text('UPDATE "user" SET token_digest = :digest WHERE id = :id'), digests)
+
+    op.create_unique_constraint('token_digest_uc', 'user', ['token_digest'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('token_digest_uc', 'user', type_='unique')
+    op.drop_column('user', 'token_digest')
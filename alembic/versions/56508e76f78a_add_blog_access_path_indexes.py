@@ -0,0 +1,37 @@
+"""Add blog access path indexes
+
+Revision ID: 56508e76f78a
+Revises: 9560824ae4c4
+Create Date: 2026-10-18 15:41:37.205114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '56508e76f78a'
+down_revision: Union[str, None] = '9560824ae4c4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Serves every /posts query (filter by owner, newest first, keyset by id)
+    # and the per-user grouping of the statistics query; built concurrently, so
+    # writes to blog go on while it builds
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_blog_user_id_created_at_id',
+            'blog',
+            ['user_id', sa.text('created_at DESC'), sa.text('id DESC')],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_blog_user_id_created_at_id', table_name='blog', postgresql_concurrently=True)
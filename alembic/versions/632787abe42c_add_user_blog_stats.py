@@ -0,0 +1,112 @@
+"""Add user blog stats
+
+Revision ID: 632787abe42c
+Revises: 56508e76f78a
+Create Date: 2026-10-18 15:58:04.663120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '632787abe42c'
+down_revision: Union[str, None] = '56508e76f78a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('user_blog_stats',
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('blog_count', sa.Integer(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+    # Writes wait until the counters are backfilled and the triggers are in place
+    op.execute('LOCK TABLE "user", blog IN SHARE MODE')
+    op.execute("""
+        INSERT INTO user_blog_stats (user_id, blog_count)
+        SELECT u.id, count(b.id) FROM "user" u LEFT JOIN blog b ON b.user_id = u.id GROUP BY u.id
+    """)
+
+    # Statement-level triggers with transition tables: one counter update per
+    # user per statement, however many rows a bulk statement touches. Counter rows
+    # are locked in user_id order, so concurrent multi-user statements cannot deadlock
+    op.execute("""
+        CREATE FUNCTION user_blog_stats_user_insert() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            INSERT INTO user_blog_stats (user_id, blog_count)
+            SELECT id, 0 FROM new_rows
+            ON CONFLICT (user_id) DO NOTHING;
+            RETURN NULL;
+        END $$
+    """)
+    op.execute("""
+        CREATE FUNCTION user_blog_stats_blog_insert() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            INSERT INTO user_blog_stats (user_id, blog_count)
+            SELECT user_id, count(*) FROM new_rows GROUP BY user_id ORDER BY user_id
+            ON CONFLICT (user_id) DO UPDATE SET blog_count = user_blog_stats.blog_count + EXCLUDED.blog_count;
+            RETURN NULL;
+        END $$
+    """)
+    op.execute("""
+        CREATE FUNCTION user_blog_stats_blog_delete() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            PERFORM 1 FROM user_blog_stats WHERE user_id IN (SELECT user_id FROM old_rows)
+            ORDER BY user_id FOR UPDATE;
+            UPDATE user_blog_stats s SET blog_count = s.blog_count - d.blog_count
+            FROM (SELECT user_id, count(*) AS blog_count FROM old_rows GROUP BY user_id) d
+            WHERE s.user_id = d.user_id;
+            RETURN NULL;
+        END $$
+    """)
+    # No endpoint moves a post to another user, so this one is per row and fires only
+    # when user_id really changes
+    op.execute("""
+        CREATE FUNCTION user_blog_stats_blog_update() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            PERFORM 1 FROM user_blog_stats WHERE user_id IN (OLD.user_id, NEW.user_id)
+            ORDER BY user_id FOR UPDATE;
+            UPDATE user_blog_stats SET blog_count = blog_count - 1 WHERE user_id = OLD.user_id;
+            INSERT INTO user_blog_stats (user_id, blog_count) VALUES (NEW.user_id, 1)
+            ON CONFLICT (user_id) DO UPDATE SET blog_count = user_blog_stats.blog_count + 1;
+            RETURN NULL;
+        END $$
+    """)
+    op.execute("""
+        CREATE TRIGGER user_blog_stats_user_insert AFTER INSERT ON "user"
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION user_blog_stats_user_insert()
+    """)
+    op.execute("""
+        CREATE TRIGGER user_blog_stats_blog_insert AFTER INSERT ON blog
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION user_blog_stats_blog_insert()
+    """)
+    op.execute("""
+        CREATE TRIGGER user_blog_stats_blog_delete AFTER DELETE ON blog
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION user_blog_stats_blog_delete()
+    """)
+    op.execute("""
+        CREATE TRIGGER user_blog_stats_blog_update AFTER UPDATE OF user_id ON blog
+        FOR EACH ROW WHEN (OLD.user_id IS DISTINCT FROM NEW.user_id)
+        EXECUTE FUNCTION user_blog_stats_blog_update()
+    """)
+
+
+def downgrade() -> None:
+    op.execute('DROP TRIGGER user_blog_stats_blog_update ON blog')
+    op.execute('DROP TRIGGER user_blog_stats_blog_delete ON blog')
+    op.execute('DROP TRIGGER user_blog_stats_blog_insert ON blog')
+    op.execute('DROP TRIGGER user_blog_stats_user_insert ON "user"')
+    op.execute('DROP FUNCTION user_blog_stats_blog_update()')
+    op.execute('DROP FUNCTION user_blog_stats_blog_delete()')
+    op.execute('DROP FUNCTION user_blog_stats_blog_insert()')
+    op.execute('DROP FUNCTION user_blog_stats_user_insert()')
+    op.drop_table('user_blog_stats')
@@ -0,0 +1,47 @@
+"""Drop blog updated_at default
+
+Revision ID: 6ac0ce3f5be6
+Revises: 31e5943ee3a4
+Create Date: 2026-10-18 16:54:37.343096
+
+updated_at is NULL until a post is first updated, which is what the ORM writes for a
+single post. Core inserts (bulk create, coalesced inserts) left it out and got the
+now() default instead, so their posts looked updated at creation. The default goes,
+and those posts are reset in short batches.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6ac0ce3f5be6'
+down_revision: Union[str, None] = '31e5943ee3a4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH_SIZE = 5000
+
+
+def upgrade() -> None:
+    op.alter_column('blog', 'updated_at', server_default=None)
+
+    with op.get_context().autocommit_block():
+        # Every batch commits on its own, so row locks are held only for one batch
+        backfill = sa.text(f"""
+            WITH batch AS (SELECT id FROM blog WHERE id > :last_id ORDER BY id LIMIT {BACKFILL_BATCH_SIZE}),
+            reset AS (
+                UPDATE blog SET updated_at = NULL FROM batch
+                WHERE blog.id = batch.id AND blog.updated_at = blog.created_at
+            )
+            SELECT id FROM batch ORDER BY id DESC LIMIT 1
+        """)
+        last_id = '00000000-0000-0000-0000-000000000000'
+        while (last_id := op.get_bind().execute(backfill, {'last_id': last_id}).scalar()) is not None:
+            pass
+
+
+def downgrade() -> None:
+    # Posts reset to NULL keep it, there is no telling them from posts never updated
+    op.alter_column('blog', 'updated_at', server_default=sa.text('now()'))
@@ -0,0 +1,67 @@
+"""Add blog full text search
+
+Revision ID: 9560824ae4c4
+Revises: 03b412e71519
+Create Date: 2026-10-18 15:30:12.418903
+
+Staged so that a large blog table stays writable: the column is added without a
+default (no table rewrite), a trigger fills it for new and changed posts, existing
+posts are backfilled in short transactions and the GIN index is built concurrently.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9560824ae4c4'
+down_revision: Union[str, None] = '03b412e71519'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH_SIZE = 5000
+
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('simple', coalesce({row}title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce({row}content, '')), 'B')"
+)
+
+
+def upgrade() -> None:
+    op.add_column('blog', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+    op.execute(f"""
+        CREATE FUNCTION blog_search_vector() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            NEW.search_vector := {SEARCH_VECTOR.format(row='NEW.')};
+            RETURN NEW;
+        END
+        $$
+    """)
+    op.execute("""
+        CREATE TRIGGER blog_search_vector BEFORE INSERT OR UPDATE OF title, content ON blog
+        FOR EACH ROW EXECUTE FUNCTION blog_search_vector()
+    """)
+
+    with op.get_context().autocommit_block():
+        # Every batch commits on its own, so row locks are held only for one batch
+        backfill = sa.text(f"""
+            UPDATE blog SET search_vector = {SEARCH_VECTOR.format(row='')}
+            WHERE id IN (SELECT id FROM blog WHERE id > :last_id ORDER BY id LIMIT {BACKFILL_BATCH_SIZE})
+            RETURNING id
+        """)
+        last_id = '00000000-0000-0000-0000-000000000000'
+        while ids := op.get_bind().execute(backfill, {'last_id': last_id}).scalars().all():
+            last_id = max(ids)
+        op.create_index('ix_blog_search_vector', 'blog', ['search_vector'], unique=False,
+                        postgresql_using='gin', postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_blog_search_vector', table_name='blog', postgresql_using='gin',
+                      postgresql_concurrently=True)
+    op.execute("DROP TRIGGER blog_search_vector ON blog")
+    op.execute("DROP FUNCTION blog_search_vector()")
+    op.drop_column('blog', 'search_vector')
@@ -0,0 +1,54 @@
+"""Import throughput: one POST /posts/ per post vs POST /posts/bulk batches.
+
+Drives the app in-process through an ASGI client. Needs the database
+from .env:
+
+    python -m benchmarks.bulk_import --posts 2000 --batch 500
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+import main
+from benchmarks.common import asgi_client, drop_bench_user
+from src.core.secure import encrypt_token, token_digest
+from src.crud.database import engine, async_session_factory
+from src.crud.models import UserModel
+
+
+async def run(posts: int, batch: int) -> None:
+    token = f"benchmark-{uuid.uuid4()}"
+    async with async_session_factory() as session:
+        user = UserModel(name="benchmark", token=encrypt_token(token), token_digest=token_digest(token))
+        session.add(user)
+        await session.commit()
+    headers = {"Authorization": f"Bearer {token}"}
+    items = [{"title": f"imported {i}", "content": "x" * 500} for i in range(posts)]
+    try:
+        async with asgi_client(main.app) as client:
+            started = time.perf_counter()
+            for item in items:
+                (await client.post("/api/v1/posts/", json=item, headers=headers)).raise_for_status()
+            single = time.perf_counter() - started
+
+            started = time.perf_counter()
+            for offset in range(0, posts, batch):
+                response = await client.post("/api/v1/posts/bulk", json=items[offset:offset + batch], headers=headers)
+                response.raise_for_status()
+            bulk = time.perf_counter() - started
+    finally:
+        async with async_session_factory() as session:
+            await drop_bench_user(session, user.id)
+        await engine.dispose()
+    print(f"single POST /posts/:     {posts / single:10.1f} posts/s ({single:.2f} s)")
+    print(f"POST /posts/bulk ({batch}): {posts / bulk:10.1f} posts/s ({bulk:.2f} s)")
+    print(f"speedup: {single / bulk:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--posts", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(run(args.posts, args.batch))
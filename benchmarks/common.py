@@ -0,0 +1,84 @@
+import math
+import statistics
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import delete, event
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from src.core.secure import encrypt_token, token_digest
+from src.crud.models import BlogModel, UserModel
+
+
+class RoundTripCounter:
+    """Counts statements, BEGINs and COMMITs/ROLLBACKs sent over an engine."""
+
+    def __init__(self, engine: AsyncEngine):
+        self.count = 0
+        sync_engine = engine.sync_engine
+        event.listen(sync_engine, "before_cursor_execute", self._inc)
+        for name in ("begin", "commit", "rollback"):
+            event.listen(sync_engine, name, self._inc)
+
+    def _inc(self, *args, **kwargs) -> None:
+        self.count += 1
+
+
+def percentile(samples: list[float], q: float) -> float:
+    # Nearest-rank percentile
+    ordered = sorted(samples)
+    return ordered[max(math.ceil(q * len(ordered)) - 1, 0)]
+
+
+class Timer:
+    def __init__(self):
+        self.samples: list[float] = []
+
+    @asynccontextmanager
+    async def measure(self) -> AsyncIterator[None]:
+        started = time.perf_counter()
+        yield
+        self.samples.append(time.perf_counter() - started)
+
+    def summary(self) -> dict[str, float]:
+        return {
+            "mean_ms": statistics.fmean(self.samples) * 1000,
+            "p50_ms": percentile(self.samples, 0.50) * 1000,
+            "p95_ms": percentile(self.samples, 0.95) * 1000,
+            "p99_ms": percentile(self.samples, 0.99) * 1000,
+        }
+
+
+async def create_bench_user(session: AsyncSession) -> UserModel:
+    user = UserModel(name="benchmark", token=f"benchmark-{uuid.uuid4()}")
+    session.add(user)
+    await session.commit()
+    return user
+
+
+async def create_api_user(session: AsyncSession) -> tuple[UserModel, dict[str, str]]:
+    """A client that can call the API, with the headers to authenticate as it."""
+    token = f"benchmark-{uuid.uuid4()}"
+    user = UserModel(name="benchmark", token=encrypt_token(token), token_digest=token_digest(token))
+    session.add(user)
+    await session.commit()
+    return user, {"Authorization": f"Bearer {token}"}
+
+
+async def drop_bench_user(session: AsyncSession, user_id: uuid.UUID) -> None:
+    await session.execute(delete(BlogModel).where(BlogModel.user_id == user_id))
+    await session.execute(delete(UserModel).where(UserModel.id == user_id))
+    await session.commit()
+
+
+@asynccontextmanager
+async def asgi_client(app: FastAPI) -> AsyncIterator[httpx.AsyncClient]:
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            yield client
+
@@ -0,0 +1,86 @@
+"""Throughput of POST /posts with a commit per request against group commit.
+
+Sends --requests creates at each --concurrency level, once through
+BaseRepository.create in the request's unit of work and once through the
+InsertCoalescer (DB__INSERT_COALESCING). Counts the COMMITs sent to the
+database. Needs the database from .env:
+
+    python -m benchmarks.group_commit --concurrency 1,16,64 --requests 2000
+"""
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import event
+
+from benchmarks.common import Timer, asgi_client, create_api_user, drop_bench_user
+from src.api.api_v1.endpoints import blogs
+from src.core import settings
+from src.crud import database
+from src.crud.coalescer import InsertCoalescer
+from src.crud.models import BlogModel
+from main import app
+
+
+class CommitCounter:
+    def __init__(self):
+        self.count = 0
+        event.listen(database.engine.sync_engine, "commit", self._inc)
+
+    def _inc(self, *args) -> None:
+        self.count += 1
+
+
+async def post_blogs(client, headers, requests: int, concurrency: int) -> tuple[float, Timer]:
+    timer = Timer()
+    queue = iter(range(requests))
+
+    async def worker() -> None:
+        for i in queue:
+            async with timer.measure():
+                response = await client.post("/api/v1/posts/", json={"title": f"group {i}", "content": "x" * 200},
+                                             headers=headers)
+            response.raise_for_status()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - started, timer
+
+
+async def run(levels: list[int], requests: int, batch_size: int, wait_ms: float) -> None:
+    async with database.async_session_factory() as session:
+        user, headers = await create_api_user(session)
+    commits = CommitCounter()
+    try:
+        async with asgi_client(app) as client:
+            while not app.state.ready:
+                await asyncio.sleep(0.01)
+            for concurrency in levels:
+                print(f"{requests} creates, {concurrency} concurrent:")
+                for name, coalescer in (
+                    ("commit per request", None),
+                    ("group commit", InsertCoalescer(BlogModel, max_batch_size=batch_size, max_wait=wait_ms / 1000)),
+                ):
+                    blogs.blog_inserts = coalescer
+                    before = commits.count
+                    elapsed, timer = await post_blogs(client, headers, requests, concurrency)
+                    summary = timer.summary()
+                    line = (f"  {name:<20} {requests / elapsed:7.0f} req/s  p50 {summary['p50_ms']:6.2f} ms  "
+                            f"p95 {summary['p95_ms']:6.2f} ms  commits/request {(commits.count - before) / requests:.2f}")
+                    if coalescer is not None:
+                        line += f"  rows/batch {coalescer.rows / max(coalescer.batches, 1):.1f}"
+                    print(line)
+    finally:
+        blogs.blog_inserts = None
+        async with database.async_session_factory() as session:
+            await drop_bench_user(session, user.id)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", default="1,16,64")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=settings.db.INSERT_BATCH_SIZE)
+    parser.add_argument("--wait-ms", type=float, default=settings.db.INSERT_BATCH_WAIT_MS)
+    args = parser.parse_args()
+    asyncio.run(run([int(level) for level in args.concurrency.split(",")], args.requests, args.batch_size, args.wait_ms))
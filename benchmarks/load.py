@@ -0,0 +1,460 @@
+"""Latency and throughput of every route in api_router.
+
+Seeds the database from .env with --users clients and --posts posts per
+client, then sends --requests requests to each route, --concurrency at a
+time. --mode asgi drives the app in-process through an ASGI client;
+--mode uvicorn starts a uvicorn worker on a free port and goes over HTTP.
+Seeded rows are removed afterwards.
+
+    python -m benchmarks.load --users 20 --posts 200 --save baseline.json
+    python -m benchmarks.load --compare baseline.json --threshold 0.1
+
+--compare exits with status 1 when a route's p95 latency grew, or its
+throughput dropped, by more than --threshold (a fraction) of the baseline.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Awaitable, Callable
+
+import httpx
+from sqlalchemy import delete, insert
+
+from benchmarks.common import percentile
+from src.api.api_v1.api import api_router
+from src.core import settings
+from src.core.secure import encrypt_token, token_digest
+from src.crud.database import engine, async_session_factory
+from src.crud.models import BlogModel, UserModel
+
+BULK_SIZE = 10
+WORDS = ("postgres", "latency", "index", "cursor", "replica", "cache", "async", "pool", "vacuum", "query")
+
+
+@dataclass
+class Fixture:
+    tag: str
+    users: list[tuple[uuid.UUID, str]] = field(default_factory=list)
+    posts: dict[uuid.UUID, list[uuid.UUID]] = field(default_factory=dict)
+    # Rows the delete routes use up, one or BULK_SIZE per request
+    spare_posts: list[uuid.UUID] = field(default_factory=list)
+    spare_clients: list[uuid.UUID] = field(default_factory=list)
+
+    def user(self, i: int) -> tuple[uuid.UUID, dict[str, str]]:
+        user_id, token = self.users[i % len(self.users)]
+        return user_id, {"Authorization": f"Bearer {token}"}
+
+    def post(self, i: int) -> tuple[uuid.UUID, dict[str, str]]:
+        user_id, headers = self.user(i)
+        posts = self.posts[user_id]
+        return posts[i % len(posts)], headers
+
+    def take(self, pool: list[uuid.UUID], count: int = 1) -> list[uuid.UUID]:
+        taken, pool[:count] = pool[:count], []
+        return taken
+
+
+Scenario = Callable[[httpx.AsyncClient, Fixture, int], Awaitable[httpx.Response]]
+MASTER = {"API": settings.api.MASTER_KEY}
+SCENARIOS: dict[str, Scenario] = {}
+# Statuses that are the expected answer of a route in some configurations
+ALLOWED_STATUSES: dict[str, set[int]] = {"result_cache_stats": {404}}
+
+
+def scenario(name: str):
+    def register(func: Scenario) -> Scenario:
+        SCENARIOS[name] = func
+        return func
+    return register
+
+
+def text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+@scenario("create_clients")
+async def _(client, fx, i):
+    token = f"{fx.tag}-{uuid.uuid4()}"
+    return await client.post("/api/v1/clients/", json={"name": f"{fx.tag}-new", "token": token}, headers=MASTER)
+
+
+@scenario("get_clients")
+async def _(client, fx, i):
+    return await client.get("/api/v1/clients/", params={"id": str(fx.user(i)[0])}, headers=MASTER)
+
+
+@scenario("get_clients_list")
+async def _(client, fx, i):
+    return await client.get("/api/v1/clients/list", params={"limit": 50}, headers=MASTER)
+
+
+@scenario("put_clients")
+async def _(client, fx, i):
+    user_id, token = fx.users[i % len(fx.users)]
+    return await client.put("/api/v1/clients/", params={"id": str(user_id)},
+                            json={"name": f"{fx.tag}-user", "token": token}, headers=MASTER)
+
+
+@scenario("delete_clients")
+async def _(client, fx, i):
+    return await client.delete("/api/v1/clients/", params={"id": str(fx.take(fx.spare_clients)[0])}, headers=MASTER)
+
+
+@scenario("create_clients_bulk")
+async def _(client, fx, i):
+    payload = [{"name": f"{fx.tag}-new", "token": f"{fx.tag}-{uuid.uuid4()}"} for _ in range(BULK_SIZE)]
+    return await client.post("/api/v1/clients/bulk", json=payload, headers=MASTER)
+
+
+@scenario("put_clients_bulk")
+async def _(client, fx, i):
+    users = [fx.users[(i * BULK_SIZE + n) % len(fx.users)] for n in range(min(BULK_SIZE, len(fx.users)))]
+    payload = [{"id": str(user_id), "name": f"{fx.tag}-user", "token": token} for user_id, token in users]
+    return await client.patch("/api/v1/clients/bulk", json=payload, headers=MASTER)
+
+
+@scenario("delete_clients_bulk")
+async def _(client, fx, i):
+    ids = [str(client_id) for client_id in fx.take(fx.spare_clients, BULK_SIZE)]
+    return await client.request("DELETE", "/api/v1/clients/bulk", json=ids, headers=MASTER)
+
+
+@scenario("blog_create")
+async def _(client, fx, i):
+    rng = random.Random(i)
+    return await client.post("/api/v1/posts/", json={"title": text(rng, 4), "content": text(rng, 80)},
+                             headers=fx.user(i)[1])
+
+
+@scenario("blog_list")
+async def _(client, fx, i):
+    return await client.get("/api/v1/posts/list", params={"limit": 50}, headers=fx.user(i)[1])
+
+
+@scenario("blog_export")
+async def _(client, fx, i):
+    return await client.get("/api/v1/posts/export", headers=fx.user(i)[1])
+
+
+@scenario("blog_get")
+async def _(client, fx, i):
+    post_id, headers = fx.post(i)
+    return await client.get("/api/v1/posts/", params={"id": str(post_id)}, headers=headers)
+
+
+@scenario("blog_get_batch")
+async def _(client, fx, i):
+    user_id, headers = fx.user(i)
+    ids = [str(post_id) for post_id in fx.posts[user_id][:BULK_SIZE]]
+    return await client.get("/api/v1/posts/batch", params={"ids": ids}, headers=headers)
+
+
+@scenario("blog_post_batch")
+async def _(client, fx, i):
+    user_id, headers = fx.user(i)
+    ids = [str(post_id) for post_id in fx.posts[user_id][:BULK_SIZE]]
+    return await client.post("/api/v1/posts/batch", json=ids, headers=headers)
+
+
+@scenario("blog_search")
+async def _(client, fx, i):
+    return await client.post("/api/v1/posts/search", json={"query": WORDS[i % len(WORDS)]},
+                             params={"limit": 20}, headers=fx.user(i)[1])
+
+
+@scenario("blog_update")
+async def _(client, fx, i):
+    post_id, headers = fx.post(i)
+    rng = random.Random(i)
+    return await client.put("/api/v1/posts/", params={"id": str(post_id)},
+                            json={"title": text(rng, 4), "content": text(rng, 80)}, headers=headers)
+
+
+@scenario("blog_delete")
+async def _(client, fx, i):
+    post_id = fx.take(fx.spare_posts)[0]
+    return await client.delete("/api/v1/posts/", params={"id": str(post_id)}, headers=fx.user(0)[1])
+
+
+@scenario("blog_bulk_create")
+async def _(client, fx, i):
+    rng = random.Random(i)
+    payload = [{"title": text(rng, 4), "content": text(rng, 80)} for _ in range(BULK_SIZE)]
+    return await client.post("/api/v1/posts/bulk", json=payload, headers=fx.user(i)[1])
+
+
+@scenario("blog_bulk_update")
+async def _(client, fx, i):
+    user_id, headers = fx.user(i)
+    rng = random.Random(i)
+    payload = [
+        {"id": str(post_id), "title": text(rng, 4), "content": text(rng, 80)}
+        for post_id in fx.posts[user_id][:BULK_SIZE]
+    ]
+    return await client.patch("/api/v1/posts/bulk", json=payload, headers=headers)
+
+
+@scenario("blog_bulk_delete")
+async def _(client, fx, i):
+    ids = [str(post_id) for post_id in fx.take(fx.spare_posts, BULK_SIZE)]
+    return await client.request("DELETE", "/api/v1/posts/bulk", json=ids, headers=fx.user(0)[1])
+
+
+@scenario("blog_statistics")
+async def _(client, fx, i):
+    return await client.get("/api/v1/posts/statistics/", params={"user_id": str(fx.user(i)[0])}, headers=MASTER)
+
+
+@scenario("blog_statistics_global")
+async def _(client, fx, i):
+    return await client.get("/api/v1/posts/statistics/global", headers=MASTER)
+
+
+@scenario("auth_cache_stats")
+async def _(client, fx, i):
+    return await client.get("/api/v1/service/auth-cache", headers=MASTER)
+
+
+@scenario("result_cache_stats")
+async def _(client, fx, i):
+    return await client.get("/api/v1/service/cache", headers=MASTER)
+
+
+@scenario("db_pool_stats")
+async def _(client, fx, i):
+    return await client.get("/api/v1/service/pool", headers=MASTER)
+
+
+@scenario("db_replicas_status")
+async def _(client, fx, i):
+    return await client.get("/api/v1/service/replicas", headers=MASTER)
+
+
+def client_rows(tag: str, count: int) -> tuple[list[dict], list[tuple[uuid.UUID, str]]]:
+    rows, credentials = [], []
+    for _ in range(count):
+        user_id, token = uuid.uuid4(), f"{tag}-{uuid.uuid4()}"
+        rows.append({"id": user_id, "name": f"{tag}-user", "token": encrypt_token(token),
+                     "token_digest": token_digest(token)})
+        credentials.append((user_id, token))
+    return rows, credentials
+
+
+async def seed(users: int, posts: int, spare: int) -> Fixture:
+    fx = Fixture(tag=f"load-{uuid.uuid4().hex[:8]}")
+    rng = random.Random(0)
+    rows, fx.users = client_rows(fx.tag, users)
+    spare_rows, spare_clients = client_rows(fx.tag, spare)
+    fx.spare_clients = [client_id for client_id, _ in spare_clients]
+    post_rows = []
+    for user_id, _ in fx.users:
+        fx.posts[user_id] = [uuid.uuid4() for _ in range(posts)]
+        post_rows.extend(
+            {"id": post_id, "user_id": user_id, "title": text(rng, 4), "content": text(rng, 80)}
+            for post_id in fx.posts[user_id]
+        )
+    fx.spare_posts = [uuid.uuid4() for _ in range(spare)]
+    post_rows.extend(
+        {"id": post_id, "user_id": fx.users[0][0], "title": "spare", "content": text(rng, 20)}
+        for post_id in fx.spare_posts
+    )
+    async with async_session_factory() as session:
+        await session.execute(insert(UserModel), rows + spare_rows)
+        for offset in range(0, len(post_rows), 5000):
+            await session.execute(insert(BlogModel), post_rows[offset:offset + 5000])
+        await session.commit()
+    return fx
+
+
+async def cleanup(fx: Fixture) -> None:
+    async with async_session_factory() as session:
+        tagged = UserModel.name.startswith(fx.tag)
+        await session.execute(delete(BlogModel).where(BlogModel.user_id.in_(
+            UserModel.__table__.select().with_only_columns(UserModel.id).where(tagged)
+        )))
+        await session.execute(delete(UserModel).where(tagged))
+        await session.commit()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@asynccontextmanager
+async def uvicorn_client(concurrency: int, server_log: str) -> AsyncIterator[httpx.AsyncClient]:
+    port = free_port()
+    with open(server_log, "w") as log:
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+             "--log-level", "warning", "--no-access-log"],
+            stdout=log, stderr=subprocess.STDOUT,
+        )
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+            deadline = time.monotonic() + 30
+            while True:
+                try:
+                    (await client.get("/openapi.json")).raise_for_status()
+                    break
+                except httpx.TransportError:
+                    if server.poll() is not None or time.monotonic() > deadline:
+                        raise RuntimeError(f"uvicorn did not start, see {server_log}")
+                    await asyncio.sleep(0.2)
+            yield client
+    finally:
+        server.terminate()
+        server.wait()
+
+
+@asynccontextmanager
+async def asgi_client() -> AsyncIterator[httpx.AsyncClient]:
+    import main
+    from benchmarks.common import asgi_client as app_client
+    async with app_client(main.app) as client:
+        yield client
+
+
+async def drive(client: httpx.AsyncClient, fx: Fixture, name: str, start: int, count: int,
+                concurrency: int) -> dict:
+    func = SCENARIOS[name]
+    allowed = ALLOWED_STATUSES.get(name, set())
+    samples: list[float] = []
+    errors = 0
+    indexes = iter(range(start, start + count))
+
+    async def worker() -> None:
+        nonlocal errors
+        for i in indexes:
+            started = time.perf_counter()
+            response = await func(client, fx, i)
+            samples.append(time.perf_counter() - started)
+            if not response.is_success and response.status_code not in allowed:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": count,
+        "errors": errors,
+        "rps": count / elapsed,
+        "mean_ms": sum(samples) / len(samples) * 1000,
+        "p50_ms": percentile(samples, 0.50) * 1000,
+        "p95_ms": percentile(samples, 0.95) * 1000,
+        "p99_ms": percentile(samples, 0.99) * 1000,
+    }
+
+
+def route_names(only: list[str] | None) -> list[str]:
+    names = [route.name for route in api_router.routes]
+    missing = sorted(set(names) - SCENARIOS.keys())
+    if missing:
+        raise SystemExit(f"No load scenario for routes: {', '.join(missing)}")
+    if only:
+        unknown = sorted(set(only) - set(names))
+        if unknown:
+            raise SystemExit(f"Unknown routes: {', '.join(unknown)}")
+        names = [name for name in names if name in only]
+    return names
+
+
+async def run(args: argparse.Namespace) -> dict:
+    names = route_names(args.routes)
+    paths = {route.name: (sorted(route.methods)[0], route.path) for route in api_router.routes}
+    per_route = args.warmup + args.requests
+    fx = await seed(args.users, args.posts, spare=per_route * (BULK_SIZE + 1))
+    results = {}
+    try:
+        client_context = asgi_client() if args.mode == "asgi" else uvicorn_client(args.concurrency, args.server_log)
+        async with client_context as client:
+            for name in names:
+                # Warm-up requests fill caches and the connection pool; they are not measured
+                await drive(client, fx, name, 0, args.warmup, args.concurrency)
+                result = await drive(client, fx, name, args.warmup, args.requests, args.concurrency)
+                method, path = paths[name]
+                results[name] = {"method": method, "path": path, **result}
+                print(format_result(name, results[name]))
+    finally:
+        await cleanup(fx)
+        await engine.dispose()
+    return {
+        "meta": {
+            "mode": args.mode,
+            "users": args.users,
+            "posts": args.posts,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "python": platform.python_version(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "routes": results,
+    }
+
+
+def format_result(name: str, result: dict) -> str:
+    errors = f"  {result['errors']} errors" if result["errors"] else ""
+    return (
+        f"{result['method']:<6} {result['path']:<36} {result['rps']:9.1f} req/s  "
+        f"p50 {result['p50_ms']:7.2f}  p95 {result['p95_ms']:7.2f}  p99 {result['p99_ms']:7.2f} ms{errors}"
+    )
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list[str]:
+    regressions = []
+    for name, result in current["routes"].items():
+        base = baseline["routes"].get(name)
+        if base is None:
+            continue
+        p95_change = result["p95_ms"] / base["p95_ms"] - 1
+        rps_change = result["rps"] / base["rps"] - 1
+        flagged = p95_change > threshold or rps_change < -threshold
+        marker = "REGRESSION" if flagged else "ok"
+        print(f"{marker:<10} {result['method']:<6} {result['path']:<36} "
+              f"p95 {base['p95_ms']:7.2f} -> {result['p95_ms']:7.2f} ms ({p95_change:+.0%})  "
+              f"{base['rps']:8.1f} -> {result['rps']:8.1f} req/s ({rps_change:+.0%})")
+        if flagged:
+            regressions.append(name)
+    parameters = ("mode", "users", "posts", "requests", "concurrency")
+    if any(baseline["meta"].get(key) != current["meta"][key] for key in parameters):
+        print(f"Note: the baseline was taken with different parameters: {baseline['meta']}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mode", choices=("asgi", "uvicorn"), default="asgi")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--posts", type=int, default=200, help="posts per user")
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per route")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--routes", nargs="*", help="route names, e.g. blog_list blog_get (default: all)")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to compare the results with")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    parser.add_argument("--server-log", default=os.devnull, help="uvicorn output in --mode uvicorn")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump(report, file, indent=2)
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(json.load(file), report, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} routes regressed by more than {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
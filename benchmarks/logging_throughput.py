@@ -0,0 +1,92 @@
+"""Cost of log lines on the request path.
+
+Compares the old setup (synchronous sink, the statement compiled into an
+f-string at INFO) with configure_logging: lazy DEBUG query lines and a
+writer thread behind a bounded queue. Lines go to a temporary file that
+takes --write-latency-us per write, like a pipe to a busy log collector.
+No database is needed:
+
+    python -m benchmarks.logging_throughput --calls 20000
+"""
+import argparse
+import sys
+import tempfile
+import time
+
+from loguru import logger
+
+from src.core.logs import configure_logging, log_query
+from src.core.settings import LogConfig
+from src.crud.repo.base import BaseRepository
+from src.crud.models import BlogModel
+
+# The statement GET /posts/list logs
+QUERY = BaseRepository(BlogModel, None).page_query(BlogModel, limit=100, whereclause=BlogModel.user_id == None)
+
+
+class SlowStream:
+    def __init__(self, stream, latency: float):
+        self.stream = stream
+        self.latency = latency
+
+    def write(self, text: str) -> None:
+        time.sleep(self.latency)
+        self.stream.write(text)
+
+    def flush(self) -> None:
+        self.stream.flush()
+
+
+def old_query_line() -> None:
+    logger.info(f"Query: {str(QUERY)}")
+
+
+def new_query_line() -> None:
+    log_query(QUERY)
+
+
+def request_line() -> None:
+    # A line that is always written, e.g. "Blog success get list"
+    logger.info("Blog success get list")
+
+
+def measure(emit, calls: int, stream, config: LogConfig | None) -> tuple[float, float]:
+    """Returns (us per line on the caller's side, us per line until everything is written)."""
+    if config is None:
+        logger.remove()
+        logger.add(stream, level="INFO")
+    else:
+        configure_logging(config, debug=False, stream=stream)
+    started = time.perf_counter()
+    for _ in range(calls):
+        emit()
+    caller = time.perf_counter() - started
+    logger.remove()  # waits for the writer thread to drain
+    written = time.perf_counter() - started
+    return caller / calls * 1_000_000, written / calls * 1_000_000
+
+
+def run(calls: int, write_latency: float) -> None:
+    cases = [
+        ("old: query f-string at INFO, sync", old_query_line, None),
+        ("new: lazy query at DEBUG, level INFO", new_query_line, LogConfig(LEVEL="INFO")),
+        ("new: lazy query, level DEBUG, queue", new_query_line, LogConfig(LEVEL="DEBUG", QUEUE_SIZE=calls)),
+        ("new: lazy query, level DEBUG, 1% sampled", new_query_line, LogConfig(LEVEL="DEBUG", SAMPLE_RATE=0.01)),
+        ("old: request line, sync", request_line, None),
+        ("new: request line, sync", request_line, LogConfig(QUEUE=False)),
+        ("new: request line, queue", request_line, LogConfig(QUEUE_SIZE=calls)),
+        ("new: request line, queue, JSON", request_line, LogConfig(JSON=True, QUEUE_SIZE=calls)),
+    ]
+    for name, emit, config in cases:
+        with tempfile.TemporaryFile("w") as file:
+            caller, written = measure(emit, calls, SlowStream(file, write_latency), config)
+        print(f"{name:<42} {caller:8.2f} us/line in the caller, {written:8.2f} us/line written")
+    logger.add(sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=20_000)
+    parser.add_argument("--write-latency-us", type=float, default=50)
+    args = parser.parse_args()
+    run(args.calls, args.write_latency_us / 1_000_000)
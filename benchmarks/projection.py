@@ -0,0 +1,99 @@
+"""GET /posts/list with all fields against fields=summary on large posts.
+
+Seeds a client with --posts posts of --content-kb KB of random text (stored
+out of line in TOAST), then pages through them --limit at a time with
+both representations. Reports latency, response size, and the TOAST
+blocks read to fetch the first page. Needs the database from .env:
+
+    python -m benchmarks.projection --posts 500 --content-kb 32 --limit 100
+"""
+import argparse
+import asyncio
+import random
+import string
+
+from sqlalchemy import text
+
+from benchmarks.common import Timer, asgi_client, create_api_user, drop_bench_user
+from src.api.api_v1.endpoints.blogs import blog_projection
+from src.crud import database
+from src.crud.models import BlogModel
+from src.crud.repo.base import BaseRepository
+from main import app
+
+
+TOAST_BLOCKS = text(
+    "SELECT coalesce(toast_blks_hit, 0) + coalesce(toast_blks_read, 0) FROM pg_statio_user_tables "
+    "WHERE relname = :table"
+)
+
+
+async def toast_blocks_of(query) -> int:
+    """TOAST blocks read to run the query and fetch its rows."""
+    async with database.engine.connect() as connection:
+        async def flushed_count() -> int:
+            # Statistics of this backend are flushed when it goes idle after the forced flush
+            await connection.execute(text("SELECT pg_stat_force_next_flush()"))
+            await connection.commit()
+            count = (await connection.execute(TOAST_BLOCKS, {"table": BlogModel.__tablename__})).scalar_one()
+            await connection.commit()
+            return count
+
+        before = await flushed_count()
+        (await connection.execute(query)).all()
+        return await flushed_count() - before
+
+
+async def run(posts: int, content_kb: int, limit: int, repeat: int) -> None:
+    rng = random.Random(0)
+    async with database.async_session_factory() as session:
+        user, headers = await create_api_user(session)
+        for _ in range(posts):
+            # Random text compresses badly, so the content is stored out of line
+            content = "".join(rng.choices(string.ascii_letters + " ", k=content_kb * 1024))
+            session.add(BlogModel(user_id=user.id, title=content[:40], content=content))
+        await session.commit()
+    try:
+        async with asgi_client(app) as client:
+            while not app.state.ready:
+                await asyncio.sleep(0.01)
+            print(f"{posts} posts of {content_kb} KB, pages of {limit}:")
+            repo = BaseRepository(BlogModel, None)
+            whereclause = BlogModel.user_id == user.id
+            for name, fields in (("all fields", None), ("fields=summary", "summary")):
+                params = {"limit": limit} if fields is None else {"limit": limit, "fields": fields}
+                timer = Timer()
+                size = 0
+                for _ in range(repeat):
+                    cursor = None
+                    while True:
+                        async with timer.measure():
+                            response = await client.get(
+                                "/api/v1/posts/list", params={**params, **({"cursor": cursor} if cursor else {})},
+                                headers=headers,
+                            )
+                        response.raise_for_status()
+                        size += len(response.content)
+                        cursor = response.headers.get("x-next-cursor")
+                        if cursor is None:
+                            break
+                # Same SELECT as the route; the summary columns include the version columns
+                entities = [BlogModel] if fields is None else blog_projection.select_columns(blog_projection.fields_of(fields))
+                query = repo.page_query(*entities, limit=limit, whereclause=whereclause)
+                summary = timer.summary()
+                print(f"  {name:<15} p50 {summary['p50_ms']:7.2f} ms  p95 {summary['p95_ms']:7.2f} ms  "
+                      f"{size / len(timer.samples) / 1024:8.1f} KB/page  "
+                      f"{await toast_blocks_of(query):6d} TOAST blocks for the first page")
+    finally:
+        async with database.async_session_factory() as session:
+            await drop_bench_user(session, user.id)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--posts", type=int, default=500)
+    parser.add_argument("--content-kb", type=int, default=32)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(run(args.posts, args.content_kb, args.limit, args.repeat))
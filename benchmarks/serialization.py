@@ -0,0 +1,90 @@
+"""Requests/sec of 100-item list responses: response_model path vs FastSerializer.
+
+The "before" routes do what the endpoints used to do: jsonable_encoder on ORM
+objects, then validation and serialization through response_model, with the
+token decoded per row. No database is needed, rows are built in memory:
+
+    python -m benchmarks.serialization --requests 500 --items 100
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import datetime, timezone
+
+import httpx
+from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import UJSONResponse
+from pydantic import field_validator
+
+from src.api.serialization import FastSerializer
+from src.core.secure import encrypt_token, decrypt_token
+from src.crud.models import BlogModel, UserModel
+from src.schemas.blog import BlogOutput
+from src.schemas.user import UserOutput
+
+
+class UncachedUserOutput(UserOutput):
+    @field_validator("token")
+    def validate_login(cls, token: str):
+        return decrypt_token.__wrapped__(token)
+
+
+def build_app(items: int) -> FastAPI:
+    now = datetime.now(timezone.utc)
+    blogs = [
+        BlogModel(id=uuid.uuid4(), title=f"post {i}", content="x" * 500, created_at=now, updated_at=now,
+                  user_id=uuid.uuid4())
+        for i in range(items)
+    ]
+    users = [UserModel(id=uuid.uuid4(), name=f"client {i}", token=encrypt_token(f"token-{i}")) for i in range(items)]
+    blog_serializer = FastSerializer(BlogOutput)
+    user_serializer = FastSerializer(UserOutput, overrides={"token": decrypt_token})
+    app = FastAPI(default_response_class=UJSONResponse)
+
+    @app.get("/before/posts", response_model=list[BlogOutput])
+    async def posts_before():
+        return blogs
+
+    @app.get("/after/posts", response_model=list[BlogOutput])
+    async def posts_after():
+        return blog_serializer.response(blogs)
+
+    @app.get("/before/clients", response_model=list[UncachedUserOutput])
+    async def clients_before():
+        return jsonable_encoder(users)
+
+    @app.get("/after/clients", response_model=list[UserOutput])
+    async def clients_after():
+        return user_serializer.response(users)
+
+    return app
+
+
+async def measure(client: httpx.AsyncClient, path: str, requests: int) -> tuple[float, bytes]:
+    body = (await client.get(path)).content
+    started = time.perf_counter()
+    for _ in range(requests):
+        (await client.get(path)).raise_for_status()
+    return requests / (time.perf_counter() - started), body
+
+
+async def run(requests: int, items: int) -> None:
+    app = build_app(items)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        for resource in ("posts", "clients"):
+            before, before_body = await measure(client, f"/before/{resource}", requests)
+            after, after_body = await measure(client, f"/after/{resource}", requests)
+            assert httpx.Response(200, content=before_body).json() == httpx.Response(200, content=after_body).json()
+            print(f"{resource:8} before: {before:8.1f} req/s  after: {after:8.1f} req/s  "
+                  f"speedup: {after / before:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--items", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.items))
@@ -0,0 +1,75 @@
+"""Queries sent and latency when many identical reads arrive at the same moment.
+
+Every round sends --concurrency identical GET /posts/list requests of one
+client at once, with the auth cache cleared, as when a client's dashboards
+all refresh together. Runs with and without the singleflight layer of the
+repositories (DB__SINGLEFLIGHT). Needs the database from .env:
+
+    python -m benchmarks.singleflight --concurrency 50 --rounds 40
+"""
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import event
+
+from benchmarks.common import Timer, asgi_client, create_api_user, drop_bench_user
+from src.api.depends import auth_cache
+from src.core.singleflight import SingleFlight
+from src.crud import database
+from src.crud.models import BlogModel
+from src.crud.repo.base import BaseRepository
+from main import app
+
+
+class StatementCounter:
+    def __init__(self):
+        self.count = 0
+        event.listen(database.engine.sync_engine, "before_cursor_execute", self._inc)
+
+    def _inc(self, *args) -> None:
+        self.count += 1
+
+
+async def run(concurrency: int, rounds: int) -> None:
+    async with database.async_session_factory() as session:
+        user, headers = await create_api_user(session)
+        session.add_all([BlogModel(user_id=user.id, title=f"flight {i}", content="x" * 500) for i in range(50)])
+        await session.commit()
+    statements = StatementCounter()
+    try:
+        async with asgi_client(app) as client:
+            while not app.state.ready:
+                await asyncio.sleep(0.01)
+            print(f"{rounds} rounds of {concurrency} identical GET /posts/list:")
+            for name, singleflight in (("no singleflight", None), ("singleflight", SingleFlight())):
+                BaseRepository.singleflight = singleflight
+                timer = Timer()
+                before = statements.count
+                started = time.perf_counter()
+                for _ in range(rounds):
+                    auth_cache.clear()
+
+                    async def one() -> None:
+                        async with timer.measure():
+                            response = await client.get("/api/v1/posts/list", params={"limit": 20}, headers=headers)
+                        response.raise_for_status()
+
+                    await asyncio.gather(*(one() for _ in range(concurrency)))
+                elapsed = time.perf_counter() - started
+                summary = timer.summary()
+                sent = statements.count - before
+                print(f"  {name:<16} statements/request {sent / (rounds * concurrency):5.2f}  "
+                      f"{rounds * concurrency / elapsed:6.0f} req/s  p50 {summary['p50_ms']:6.1f} ms  "
+                      f"p95 {summary['p95_ms']:6.1f} ms")
+    finally:
+        async with database.async_session_factory() as session:
+            await drop_bench_user(session, user.id)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=40)
+    args = parser.parse_args()
+    asyncio.run(run(args.concurrency, args.rounds))
@@ -0,0 +1,97 @@
+"""Cold start: import time of the app and time until /health/ready turns healthy.
+
+Each run is a fresh interpreter. The first part runs `python -X importtime`
+and lists the slowest imports; the second measures process start to
+ready, with the pool warm-up against the database from .env. Exits with
+status 1 when the median time to ready is over --budget-ms:
+
+    python -m benchmarks.startup --runs 5 --budget-ms 2500
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+# Mirrors what a uvicorn worker does: import the app, run the lifespan, wait until ready
+READY_SCRIPT = """
+import asyncio, json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+
+async def run():
+    async with main.app.router.lifespan_context(main.app):
+        while not main.app.state.ready:
+            await asyncio.sleep(0.001)
+        return time.perf_counter()
+
+ready = asyncio.run(run())
+print(json.dumps({"import_ms": (imported - started) * 1000, "warm_up_ms": (ready - imported) * 1000}))
+"""
+
+
+def import_times() -> list[tuple[str, int, int, int]]:
+    """(module, depth, self us, cumulative us) of every module `import main` loads."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        capture_output=True, text=True, check=True,
+    )
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return modules
+
+
+def report_imports(top: int) -> None:
+    modules = import_times()
+    total = sum(self_us for _, _, self_us, _ in modules)
+    print(f"import main: {total / 1000:.0f} ms in {len(modules)} modules")
+    packages: dict[str, int] = defaultdict(int)
+    for name, _, self_us, _ in modules:
+        packages[name.split(".")[0]] += self_us
+    print("by top-level package:")
+    for package, self_us in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+        print(f"  {self_us / 1000:8.1f} ms  {package}")
+    print("slowest modules (self time):")
+    for name, _, self_us, cumulative_us in sorted(modules, key=lambda module: -module[2])[:top]:
+        print(f"  {self_us / 1000:8.1f} ms  {name} ({cumulative_us / 1000:.1f} ms with its imports)")
+
+
+def measure_ready() -> dict[str, float]:
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", READY_SCRIPT], capture_output=True, text=True)
+    total = (time.perf_counter() - started) * 1000
+    if result.returncode != 0:
+        raise SystemExit(result.stderr)
+    phases = json.loads(result.stdout.strip().splitlines()[-1])
+    # What is left is interpreter start-up and shutdown
+    return {**phases, "total_ms": total}
+
+
+def run(runs: int, budget_ms: float, top: int) -> bool:
+    report_imports(top)
+    samples = [measure_ready() for _ in range(runs)]
+    print(f"time to ready, median of {runs} runs:")
+    for key in ("import_ms", "warm_up_ms", "total_ms"):
+        print(f"  {key:<11} {statistics.median(sample[key] for sample in samples):8.1f} ms")
+    total = statistics.median(sample["total_ms"] for sample in samples)
+    within = total <= budget_ms
+    print(f"budget {budget_ms:.0f} ms: {'ok' if within else 'EXCEEDED'}")
+    return within
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=2500)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+    if not run(args.runs, args.budget_ms, args.top):
+        sys.exit(1)
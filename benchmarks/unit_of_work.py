@@ -0,0 +1,160 @@
+"""Pool connections held per request, and throughput with a small fixed pool.
+
+Compares the former dependency layout, where a read-only repository got a
+session of its own next to the one of the auth lookup and every repository
+write committed by itself, with the request-scoped unit of work. The auth
+cache is cleared before every request, so each one runs the auth lookup.
+Needs the database from .env:
+
+    python -m benchmarks.unit_of_work --pool-size 5 --concurrency 50 --requests 2000
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+from fastapi import Request
+from sqlalchemy import event, exc
+
+from benchmarks.common import Timer, asgi_client, create_api_user, drop_bench_user
+from src.api.depends import auth_cache, caller_key, get_unit_of_work
+from src.core import settings
+from src.crud import database
+from src.crud.models import BlogModel
+from src.crud.pool import pool_stats
+from src.crud.unit_of_work import UnitOfWork, connect_read_session
+from main import app
+
+
+class PerRepositorySessions(UnitOfWork):
+    """The former layout: repositories commit by themselves, read-only ones get their own session."""
+
+    @property
+    def session(self):
+        if self._session is None:
+            self._session = database.async_session_factory()
+        return self._session
+
+    async def read_session(self):
+        if self._read_session is None:
+            self._read_session = await connect_read_session(self.caller)
+        return self._read_session
+
+
+async def per_repository_sessions(request: Request):
+    sessions = PerRepositorySessions(caller_key(request))
+    try:
+        yield sessions
+        await sessions.commit()
+    except exc.SQLAlchemyError:
+        await sessions.rollback()
+        raise
+    finally:
+        await sessions.close()
+
+
+class CheckoutCounter:
+    """Checkouts and the most connections checked out at once since the last reset."""
+
+    def __init__(self):
+        self.checked_out = self.checkouts = self.peak = 0
+        event.listen(database.engine.sync_engine, "checkout", self._checkout)
+        event.listen(database.engine.sync_engine, "checkin", self._checkin)
+
+    def _checkout(self, *args) -> None:
+        self.checkouts += 1
+        self.checked_out += 1
+        self.peak = max(self.peak, self.checked_out)
+
+    def _checkin(self, *args) -> None:
+        self.checked_out -= 1
+
+    def reset(self) -> None:
+        self.checkouts = self.peak = 0
+
+
+ROUTES = {
+    "GET /posts/list": lambda client, headers, i: client.get("/api/v1/posts/list", params={"limit": 20}, headers=headers),
+    "POST /posts": lambda client, headers, i: client.post(
+        "/api/v1/posts/", json={"title": f"uow {i}", "content": "x" * 200}, headers=headers,
+    ),
+}
+
+
+async def connections_per_request(client, headers, counter: CheckoutCounter, route: str, samples: int) -> str:
+    checkouts = peak = 0
+    for i in range(samples):
+        auth_cache.clear()
+        counter.reset()
+        response = await ROUTES[route](client, headers, i)
+        response.raise_for_status()
+        checkouts += counter.checkouts
+        peak = max(peak, counter.peak)
+    return f"{checkouts / samples:.1f} checkouts, at most {peak} held at once"
+
+
+async def throughput(client, headers, route: str, requests: int, concurrency: int) -> str:
+    timer = Timer()
+    queue = iter(range(requests))
+    wait_before = pool_stats(database.engine)["wait_time_total"]
+
+    failed = 0
+
+    async def worker() -> None:
+        nonlocal failed
+        for i in queue:
+            auth_cache.clear()
+            try:
+                async with timer.measure():
+                    response = await ROUTES[route](client, headers, i)
+                response.raise_for_status()
+            except (httpx.HTTPError, exc.TimeoutError):
+                # Pool checkouts that timed out, i.e. requests starved of a connection
+                failed += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    waited = pool_stats(database.engine)["wait_time_total"] - wait_before
+    summary = timer.summary()
+    return (f"{requests / elapsed:7.0f} req/s  p50 {summary['p50_ms']:6.1f} ms  p95 {summary['p95_ms']:6.1f} ms  "
+            f"pool wait {waited / requests * 1000:6.2f} ms/request  failed {failed}")
+
+
+async def run(pool_size: int, pool_timeout: float, concurrency: int, requests: int, samples: int) -> None:
+    # Engines are built on first use, so the pool limits can still be changed here
+    settings.db.POOL_SIZE, settings.db.MAX_OVERFLOW, settings.db.MAX_CONNECTIONS = pool_size, 0, None
+    settings.db.POOL_TIMEOUT = pool_timeout
+    counter = CheckoutCounter()
+    async with database.async_session_factory() as session:
+        user, headers = await create_api_user(session)
+        session.add_all([BlogModel(user_id=user.id, title=f"uow {i}", content="x" * 200) for i in range(50)])
+        await session.commit()
+    try:
+        async with asgi_client(app) as client:
+            while not app.state.ready:
+                await asyncio.sleep(0.01)
+            for name, override in (("per-repository sessions", per_repository_sessions), ("unit of work", None)):
+                app.dependency_overrides.clear()
+                if override is not None:
+                    app.dependency_overrides[get_unit_of_work] = override
+                print(f"{name} (pool of {pool_size}, {concurrency} concurrent):")
+                for route in ROUTES:
+                    held = await connections_per_request(client, headers, counter, route, samples)
+                    print(f"  {route:<16} {held}")
+                    print(f"  {'':<16} {await throughput(client, headers, route, requests, concurrency)}")
+    finally:
+        app.dependency_overrides.clear()
+        async with database.async_session_factory() as session:
+            await drop_bench_user(session, user.id)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pool-size", type=int, default=5)
+    parser.add_argument("--pool-timeout", type=float, default=5)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--samples", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(run(args.pool_size, args.pool_timeout, args.concurrency, args.requests, args.samples))
@@ -0,0 +1,88 @@
+"""Round trips and latency of a single post update/delete.
+
+Compares the former SELECT-then-write repository path with the
+UPDATE/DELETE ... RETURNING one. Needs the database from .env:
+
+    python -m benchmarks.write_round_trips --iterations 200
+"""
+import argparse
+import asyncio
+import uuid
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from benchmarks.common import RoundTripCounter, Timer, create_bench_user, drop_bench_user
+from src.crud.database import engine, async_session_factory
+from src.crud.models import BlogModel
+from src.crud.repo.base import BaseRepository
+
+
+async def legacy_update(session: AsyncSession, blog_id: uuid.UUID, user_id: uuid.UUID, values: dict) -> None:
+    obj = (await session.execute(
+        select(BlogModel).where(BlogModel.id == blog_id, BlogModel.user_id == user_id)
+    )).scalar_one()
+    await session.execute(update(BlogModel).where(BlogModel.id == blog_id).values(values))
+    await session.commit()
+    await session.commit()
+    await session.refresh(obj)
+
+
+async def legacy_delete(session: AsyncSession, blog_id: uuid.UUID, user_id: uuid.UUID) -> None:
+    obj = (await session.execute(
+        select(BlogModel).where(BlogModel.id == blog_id, BlogModel.user_id == user_id)
+    )).scalar_one()
+    await session.delete(obj)
+    await session.commit()
+
+
+async def returning_update(session: AsyncSession, blog_id: uuid.UUID, user_id: uuid.UUID, values: dict) -> None:
+    await BaseRepository(BlogModel, session).update(blog_id, values, whereclause=BlogModel.user_id == user_id)
+
+
+async def returning_delete(session: AsyncSession, blog_id: uuid.UUID, user_id: uuid.UUID) -> None:
+    await BaseRepository(BlogModel, session).delete(blog_id, whereclause=BlogModel.user_id == user_id)
+
+
+async def seed_blogs(user_id: uuid.UUID, count: int) -> list[uuid.UUID]:
+    blogs = [BlogModel(title=f"bench {i}", content="x" * 500, user_id=user_id) for i in range(count)]
+    async with async_session_factory() as session:
+        await BaseRepository(BlogModel, session).create_all(blogs)
+    return [blog.id for blog in blogs]
+
+
+async def run_case(name: str, operation, blog_ids: list[uuid.UUID], user_id: uuid.UUID,
+                   counter: RoundTripCounter, *args) -> None:
+    timer = Timer()
+    before = counter.count
+    for blog_id in blog_ids:
+        async with async_session_factory() as session:
+            async with timer.measure():
+                await operation(session, blog_id, user_id, *args)
+    round_trips = (counter.count - before) / len(blog_ids)
+    summary = ", ".join(f"{key}={value:.3f}" for key, value in timer.summary().items())
+    print(f"{name:<18} round_trips/op={round_trips:.1f}, {summary}")
+
+
+async def main(iterations: int) -> None:
+    counter = RoundTripCounter(engine)
+    async with async_session_factory() as session:
+        user = await create_bench_user(session)
+    try:
+        values = {"title": "updated", "content": "y" * 500}
+        blog_ids = await seed_blogs(user.id, iterations)
+        await run_case("legacy update", legacy_update, blog_ids, user.id, counter, values)
+        await run_case("returning update", returning_update, blog_ids, user.id, counter, values)
+        await run_case("legacy delete", legacy_delete, blog_ids, user.id, counter)
+        blog_ids = await seed_blogs(user.id, iterations)
+        await run_case("returning delete", returning_delete, blog_ids, user.id, counter)
+    finally:
+        async with async_session_factory() as session:
+            await drop_bench_user(session, user.id)
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=200)
+    asyncio.run(main(parser.parse_args().iterations))
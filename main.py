@@ -1,37 +1,104 @@
-import sys
+import asyncio
 from contextlib import asynccontextmanager
 from typing import AsyncIterator
 
-from fastapi import FastAPI
-from fastapi.responses import UJSONResponse
+from fastapi import Depends, FastAPI
+from fastapi.responses import PlainTextResponse, UJSONResponse
 from loguru import logger
 
 from src.core.settings import settings
 from src.api.api_v1.api import api_router
+from src.core.logs import RequestIdMiddleware, configure_logging, stop_logging
+from src.core.metrics import MetricsMiddleware, multiprocess, render_metrics
+from src.core.profiling import ProfilingMiddleware
+from src.core.secure import WhiteListAPIKeyAuth
+from src.crud.notifications import notifications
+from src.crud.warmup import warm_up
+
+configure_logging(settings.log, settings.run.DEBUG)
+
+WARMUP_RETRY_MAX_SECONDS = 30
+
+
+async def warm_up_until_ready(app: FastAPI) -> None:
+    delay = 1
+    while settings.db.WARMUP_CONNECTIONS != 0:
+        try:
+            await warm_up(settings.db.WARMUP_CONNECTIONS)
+            break
+        except Exception as error:
+            # Whatever fails (connection, pool timeout, a statement), the worker has to become ready eventually
+            logger.error(f"Warm-up failed, retrying in {delay} s: {error!r}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, WARMUP_RETRY_MAX_SECONDS)
+    app.state.ready = True
+    logger.info("Server ready")
 
-logger.remove()
-logger.add(sys.stderr, level="DEBUG" if settings.run.DEBUG else "INFO")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncIterator[None]:
-    app.include_router(api_router)
+    # Requests are served meanwhile; /health/ready tells the balancer when to send them
+    app.state.ready = False
+    tasks = [asyncio.create_task(warm_up_until_ready(app))]
+    if notifications.handlers:
+        # Invalidations of per-process caches made by the other workers
+        tasks.append(asyncio.create_task(notifications.run()))
+    if settings.run.METRICS and multiprocess is not None:
+        tasks.append(asyncio.create_task(multiprocess.run()))
     logger.info(f"Start server")
     yield
+    app.state.ready = False
+    for task in tasks:
+        task.cancel()
+    if settings.run.METRICS and multiprocess is not None:
+        multiprocess.write()
     logger.warning(f"Stop server")
+    # Also registered with atexit, but worker processes may end without running it
+    stop_logging()
+
+
+def create_app() -> FastAPI:
+    app = FastAPI(
+        debug=settings.run.DEBUG,
+        title=settings.api.SERVICE_NAME,
+        version=settings.api.VERSION,
+        default_response_class=UJSONResponse,
+        lifespan=lifespan
+    )
+    # Included here, not in lifespan: the routes exist as soon as the app does (also for ASGI
+    # clients that skip lifespan) and are added once however often lifespan runs
+    app.include_router(api_router)
+    app.state.ready = False
+
+    @app.get("/health/live", include_in_schema=False)
+    async def live():
+        return {"status": "ok"}
+
+    @app.get("/health/ready", include_in_schema=False)
+    async def ready():
+        if not app.state.ready:
+            return UJSONResponse({"status": "warming up"}, status_code=503)
+        return {"status": "ready"}
+
+    # Always installed: besides sampling, it serves X-Profile requests made with the master key
+    app.add_middleware(ProfilingMiddleware)
+
+    if settings.run.METRICS:
+        app.add_middleware(MetricsMiddleware)
+
+        # Latencies, repository methods and pool state are internal, so like /service/* it needs the master key
+        @app.get("/metrics", include_in_schema=False,
+                 dependencies=[Depends(WhiteListAPIKeyAuth(whitelist={settings.api.MASTER_KEY}))])
+        async def metrics():
+            return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+    # Outermost, so that lines logged by the other middlewares carry the request id too
+    app.add_middleware(RequestIdMiddleware)
+    return app
+
 
-app = FastAPI(
-    debug=settings.run.DEBUG,
-    title=settings.api.SERVICE_NAME,
-    version=settings.api.VERSION,
-    default_response_class=UJSONResponse,
-    lifespan=lifespan
-)
+app = create_app()
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(
-        "main:app",
-        host=settings.run.HOST,
-        port=settings.run.PORT,
-        reload=settings.run.DEBUG,
-    )
\ No newline at end of file
+    from src.core.server import serve
+    serve()
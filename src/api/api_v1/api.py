@@ -2,6 +2,7 @@ from fastapi import APIRouter
 
 from .endpoints.users import router as clients_router
 from .endpoints.blogs import router as blogs_router, statistics_router
+from .endpoints.service import router as service_router
 from src.core.settings import settings
 
 
@@ -10,4 +11,5 @@ api_router = APIRouter(prefix="/api/{}".format(settings.api.VERSION), tags=["api
 
 api_router.include_router(clients_router)
 api_router.include_router(blogs_router)
-api_router.include_router(statistics_router)
\ No newline at end of file
+api_router.include_router(statistics_router)
+api_router.include_router(service_router)
\ No newline at end of file
@@ -1,94 +1,260 @@
 import uuid
-from http.client import HTTPException
 
 from fastapi.params import Query, Body
 from loguru import logger
-from fastapi import APIRouter, Depends
-from sqlalchemy import and_
+from fastapi import APIRouter, Depends, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, func
+from starlette.exceptions import HTTPException
 
-from src.api.depends import get_repo, get_current_user, oauth2_scheme
+from src.api.depends import get_repo, get_current_user, oauth2_scheme, caller_key
+from src.api.etag import (
+    has_conditions, if_match_versions, is_not_modified, item_etag, not_modified, page_etag,
+    set_validators, version_of,
+)
+from src.api.export import ExportFormatEnum, EXPORT_MEDIA_TYPES, export_chunks
+from src.api.bulk import BatchIds, BatchIdsQuery, BulkList, bulk_results, ensure_unique_ids
+from src.api.pagination import paginate, NEXT_CURSOR_HEADER
+from src.api.projection import Projection
+from src.api.serialization import FastSerializer
 from src.core import settings
+from src.core.logs import sampled
+from src.core.profiling import ProfiledRoute
 from src.core.secure import WhiteListAPIKeyAuth
-from src.crud.models.user import UserModel
+from src.crud import database
+from src.crud.coalescer import InsertCoalescer
+from src.crud.repo.blog import BlogRepository
+from src.exceptions.crud import RepoNotFoundException
+from src.crud.repo.pagination import decode_cursor
 from src.crud.repo.statistics import StatisticsRepository
-from src.schemas.blog import BlogInput, BlogOutput, BlogSearchInput, StatisticsBlogOutput
+from src.crud.unit_of_work import connect_read_session
+from src.schemas.user import UserPrincipal
+from src.schemas.bulk import BulkItemResult, BulkStatusEnum
+from src.schemas.blog import (
+    BlogInput, BlogBulkUpdateInput, BlogFieldsOutput, BlogOutput, BlogSearchInput, BlogSummaryOutput,
+    StatisticsBlogOutput, StatisticsGlobalBlogOutput,
+)
 from src.crud.models.blog import BlogModel
 from src.crud.repo.base import BaseRepository
 
-router = APIRouter(prefix="/posts", dependencies=[Depends(oauth2_scheme)], tags=["blogs"])
+router = APIRouter(route_class=ProfiledRoute, prefix="/posts", dependencies=[Depends(oauth2_scheme)], tags=["blogs"])
+
+blog_serializer = FastSerializer(BlogOutput)
+SNIPPET_LENGTH = 200
+blog_projection = Projection(
+    BlogFieldsOutput,
+    columns={
+        "id": BlogModel.id,
+        "title": BlogModel.title,
+        "content": BlogModel.content,
+        "created_at": BlogModel.created_at,
+        "updated_at": BlogModel.updated_at,
+        # Taken from the stored size, the content itself is not read from TOAST
+        "content_length": func.octet_length(BlogModel.content),
+        # Only the start of the content is read and decompressed
+        "snippet": func.substr(BlogModel.content, 1, SNIPPET_LENGTH),
+    },
+    presets={"summary": tuple(BlogSummaryOutput.model_fields)},
+)
+FIELDS_DESCRIPTION = (
+    f"'summary' or a comma separated list of {', '.join(blog_projection.columns)}; all fields when omitted"
+)
+blog_inserts = InsertCoalescer(
+    BlogModel,
+    max_batch_size=settings.db.INSERT_BATCH_SIZE,
+    max_wait=settings.db.INSERT_BATCH_WAIT_MS / 1000,
+) if settings.db.INSERT_COALESCING else None
 
 
 @router.post("/", status_code=201, response_model=BlogOutput)
 async def blog_create(
         payload: BlogInput,
-        user: UserModel = Depends(get_current_user),
+        request: Request,
+        user: UserPrincipal = Depends(get_current_user),
         blog_repo: BaseRepository[BlogModel] = Depends(get_repo(BlogModel)),
 ):
-    new_blog = BlogModel(title=payload.title, content=payload.content, user_id=user.id)
-    created_blog = await blog_repo.create(new_blog)
+    if blog_inserts is not None:
+        created_blog = await blog_inserts.insert({"title": payload.title, "content": payload.content, "user_id": user.id})
+        # Committed by the coalescer on its own connection, outside the request's unit of work
+        database.replica_router.mark_write(caller_key(request))
+    else:
+        new_blog = BlogModel(title=payload.title, content=payload.content, user_id=user.id)
+        created_blog = await blog_repo.create(new_blog)
     logger.info("Blog created")
-    return created_blog
+    return blog_serializer.response(created_blog, status_code=201)
 
-@router.get("/list", status_code=200, response_model=list[BlogOutput])
+@router.get("/list", status_code=200, response_model=list[BlogOutput] | list[BlogFieldsOutput])
 async def blog_list(
-        user: UserModel = Depends(get_current_user),
-        blog_repo: BaseRepository[BlogModel] = Depends(get_repo(BlogModel)),
+        request: Request,
+        response: Response,
+        user: UserPrincipal = Depends(get_current_user),
+        blog_repo: BaseRepository[BlogModel] = Depends(get_repo(BlogModel, read_only=True)),
         limit: int = Query(10, ge=1, le=100),
         offset: int = Query(0, ge=0, le=100),
+        cursor: str | None = Query(None),
+        fields: str | None = Query(None, description=FIELDS_DESCRIPTION),
 ):
-    blogs = await blog_repo.get_multi_paginated(offset, limit, whereclause=BlogModel.user_id == user.id)
-    logger.info("Blog success get list")
-    return blogs
+    names = blog_projection.fields_of(fields) if fields is not None else None
+    whereclause = BlogModel.user_id == user.id
+    if has_conditions(request):
+        versions = await paginate(
+            blog_repo, response, limit, offset, cursor, whereclause=whereclause, versions_only=True,
+        )
+        # Pages carry only an ETag: a deletion can change a page without changing its newest
+        # version, so Last-Modified/If-Modified-Since cannot tell whether it changed
+        etag = page_etag(versions)
+        if is_not_modified(request, etag, None):
+            set_validators(response, etag, None)
+            sampled.info("Blog list not modified")
+            return not_modified(response)
+    blogs = await paginate(
+        blog_repo, response, limit, offset, cursor,
+        whereclause=whereclause,
+        cache_scope=user.id,
+        projection=blog_projection.select_columns(names) if names else None,
+    )
+    set_validators(response, page_etag(blogs), None)
+    sampled.info("Blog success get list")
+    serializer = blog_projection.serializer(names) if names else blog_serializer
+    return serializer.response(blogs, response)
+
+@router.get("/export", status_code=200, response_class=StreamingResponse)
+async def blog_export(
+        request: Request,
+        user: UserPrincipal = Depends(get_current_user),
+        format: ExportFormatEnum = Query(ExportFormatEnum.ndjson),
+        gzip: bool = Query(False),
+        cursor: str | None = Query(None),
+):
+    if cursor is not None:
+        # Fail with 400 now, once streaming starts the status is already sent
+        decode_cursor(cursor, (BlogModel.created_at, BlogModel.id))
+
+    caller = caller_key(request)
+
+    async def partitions():
+        # The request session is closed before the body is streamed, so use a dedicated one.
+        # It is opened here, so nothing is checked out if the body is never iterated
+        async with await connect_read_session(caller) as session:
+            blog_repo = BaseRepository(BlogModel, session)
+            async for rows in blog_repo.stream_keyset(cursor, whereclause=BlogModel.user_id == user.id):
+                yield rows
+
+    headers = {"Content-Disposition": f'attachment; filename="posts.{format.value}"'}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    logger.info("Blog export started")
+    return StreamingResponse(
+        export_chunks(partitions(), format, gzip),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers=headers,
+    )
 
 @router.get("/", status_code=200, response_model=BlogOutput)
 async def blog_get(
+        request: Request,
+        response: Response,
         id: uuid.UUID = Query(...),
-        user: UserModel = Depends(get_current_user),
-        blog_repo: BaseRepository[BlogModel] = Depends(get_repo(BlogModel)),
+        user: UserPrincipal = Depends(get_current_user),
+        blog_repo: BaseRepository[BlogModel] = Depends(get_repo(BlogModel, read_only=True)),
 ):
     whereclause = and_(
         BlogModel.id == id,
         BlogModel.user_id == user.id)
-    blog = await blog_repo.get_by_where_one_or_none(whereclause)
-    return blog
+    if has_conditions(request):
+        version = await blog_repo.get_version_one_or_none(whereclause)
+        if is_not_modified(request, item_etag(version), version_of(version)):
+            set_validators(response, item_etag(version), version_of(version))
+            return not_modified(response)
+    blog = await blog_repo.get_by_where_one_or_none(whereclause, cache_scope=user.id)
+    set_validators(response, item_etag(blog), version_of(blog))
+    return blog_serializer.response(blog, response)
 
 
-@router.post("/search", status_code=200, response_model=list[BlogOutput])
+@router.get("/batch", status_code=200, response_model=list[BulkItemResult[BlogOutput]])
+async def blog_get_batch(
+        ids: BatchIdsQuery,
+        user: UserPrincipal = Depends(get_current_user),
+        blog_repo: BaseRepository[BlogModel] = Depends(get_repo(BlogModel, read_only=True)),
+):
+    return await get_batch(ids, user, blog_repo)
+
+
+@router.post("/batch", status_code=200, response_model=list[BulkItemResult[BlogOutput]])
+async def blog_post_batch(
+        ids: BatchIds,
+        user: UserPrincipal = Depends(get_current_user),
+        blog_repo: BaseRepository[BlogModel] = Depends(get_repo(BlogModel, read_only=True)),
+):
+    return await get_batch(ids, user, blog_repo)
+
+
+async def get_batch(ids: list[uuid.UUID], user: UserPrincipal, blog_repo: BaseRepository[BlogModel]) -> list[dict]:
+    # One "id = ANY(...)" query; results follow the order of ids, duplicates included
+    blogs = await blog_repo.get_many_by_ids(ids, whereclause=BlogModel.user_id == user.id, cache_scope=user.id)
+    sampled.info("Blog success get batch")
+    return bulk_results(ids, {blog.id: blog for blog in blogs}, BulkStatusEnum.found, BulkStatusEnum.not_found)
+
+
+@router.post("/search", status_code=200, response_model=list[BlogOutput] | list[BlogFieldsOutput])
 async def blog_search(
         payload: BlogSearchInput,
-        user: UserModel = Depends(get_current_user),
-        blog_repo: BaseRepository[BlogModel] = Depends(get_repo(BlogModel)),
+        response: Response,
+        user: UserPrincipal = Depends(get_current_user),
+        blog_repo: BlogRepository[BlogModel] = Depends(get_repo(BlogModel, BlogRepository, read_only=True)),
         limit: int = Query(10, ge=1, le=100),
         offset: int = Query(0, ge=0, le=100),
-
+        cursor: str | None = Query(None),
+        fields: str | None = Query(None, description=FIELDS_DESCRIPTION),
 ):
-    conditions = [BlogModel.user_id == user.id]
-    for field_name, field_value in payload.dict(exclude_unset=True).items():
-        blog_field = getattr(BlogModel, field_name, None)
-        if blog_field is not None:
-            conditions.append(blog_field == field_value)
-    whereclause = and_(*conditions)
-    blogs = await blog_repo.get_multi_paginated(offset, limit, whereclause=whereclause)
-    logger.info("Blog success get list")
-    return blogs
+    if offset and cursor is not None:
+        raise HTTPException(400, "Use either offset or cursor, not both")
+    names = blog_projection.fields_of(fields) if fields is not None else None
+    blogs, next_cursor = await blog_repo.search(
+        payload.search_text, payload.mode, limit, offset=offset, cursor=cursor,
+        whereclause=BlogModel.user_id == user.id,
+        projection=blog_projection.select_columns(names) if names else None,
+    )
+    if next_cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    sampled.info("Blog success search")
+    serializer = blog_projection.serializer(names) if names else blog_serializer
+    return serializer.response(blogs, response)
 
 @router.put("/", status_code=201, response_model=BlogOutput)
 async def blog_update(
+        request: Request,
+        response: Response,
         id: uuid.UUID = Query(...),
         payload: BlogInput = Body(...),
-        user: UserModel = Depends(get_current_user),
+        user: UserPrincipal = Depends(get_current_user),
         blog_repo: BaseRepository[BlogModel] = Depends(get_repo(BlogModel)),
 ):
-    update_blog = BlogModel(title=payload.title, content=payload.content, user_id=user.id)
-    blog = await blog_repo.update(id=id, obj_in=update_blog, whereclause=UserModel.id == user.id)
+    whereclause = BlogModel.user_id == user.id
+    versions = if_match_versions(request, id)
+    if versions is None:
+        blog = await blog_repo.update(id=id, obj_in=payload.model_dump(), whereclause=whereclause)
+    else:
+        # Optimistic concurrency: the UPDATE only matches the version the client has seen
+        version_column = func.coalesce(BlogModel.updated_at, BlogModel.created_at)
+        try:
+            blog = await blog_repo.update(
+                id=id,
+                obj_in=payload.model_dump(),
+                whereclause=and_(whereclause, version_column.in_(versions)),
+            )
+        except RepoNotFoundException:
+            await blog_repo.get_version_one_or_none(and_(BlogModel.id == id, whereclause))
+            raise HTTPException(412, "Post was modified")
+    set_validators(response, item_etag(blog), version_of(blog))
     logger.info("Blog updated")
-    return blog
+    return blog_serializer.response(blog, response, status_code=201)
 
 
 @router.delete("/", status_code=201)
 async def blog_delete(
         id: uuid.UUID = Query(...),
-        user: UserModel = Depends(get_current_user),
+        user: UserPrincipal = Depends(get_current_user),
         blog_repo: BaseRepository[BlogModel] = Depends(get_repo(BlogModel)),
 ):
     await blog_repo.delete(id=id, whereclause=BlogModel.user_id == user.id)
@@ -96,7 +262,54 @@ async def blog_delete(
     return 201
 
 
-statistics_router = APIRouter(prefix="/posts/statistics", tags=["posts"], dependencies=(
+@router.post("/bulk", status_code=200, response_model=list[BulkItemResult[BlogOutput]])
+async def blog_bulk_create(
+        payload: BulkList[BlogInput],
+        user: UserPrincipal = Depends(get_current_user),
+        blog_repo: BaseRepository[BlogModel] = Depends(get_repo(BlogModel)),
+):
+    rows = [
+        {"id": uuid.uuid4(), "title": item.title, "content": item.content, "user_id": user.id}
+        for item in payload
+    ]
+    errors = {}
+    created = await blog_repo.create_many(rows, errors=errors)
+    logger.info(f"Blogs bulk created: {len(created)} of {len(rows)}")
+    return bulk_results([row["id"] for row in rows], {blog.id: blog for blog in created},
+                        BulkStatusEnum.created, BulkStatusEnum.failed, errors)
+
+
+@router.patch("/bulk", status_code=200, response_model=list[BulkItemResult[BlogOutput]])
+async def blog_bulk_update(
+        payload: BulkList[BlogBulkUpdateInput],
+        user: UserPrincipal = Depends(get_current_user),
+        blog_repo: BaseRepository[BlogModel] = Depends(get_repo(BlogModel)),
+):
+    ids = [item.id for item in payload]
+    ensure_unique_ids(ids)
+    updated = await blog_repo.update_many(
+        [item.model_dump() for item in payload],
+        whereclause=BlogModel.user_id == user.id,
+    )
+    logger.info(f"Blogs bulk updated: {len(updated)}")
+    return bulk_results(ids, {blog.id: blog for blog in updated},
+                        BulkStatusEnum.updated, BulkStatusEnum.not_found)
+
+
+@router.delete("/bulk", status_code=200, response_model=list[BulkItemResult[None]])
+async def blog_bulk_delete(
+        payload: BulkList[uuid.UUID],
+        user: UserPrincipal = Depends(get_current_user),
+        blog_repo: BaseRepository[BlogModel] = Depends(get_repo(BlogModel)),
+):
+    ensure_unique_ids(payload)
+    deleted = await blog_repo.delete_many(payload, whereclause=BlogModel.user_id == user.id)
+    logger.info(f"Blogs bulk deleted: {len(deleted)}")
+    return bulk_results(payload, dict.fromkeys(deleted),
+                        BulkStatusEnum.deleted, BulkStatusEnum.not_found)
+
+
+statistics_router = APIRouter(route_class=ProfiledRoute, prefix="/posts/statistics", tags=["posts"], dependencies=(
         Depends(WhiteListAPIKeyAuth(
             whitelist={
                 settings.api.MASTER_KEY
@@ -105,11 +318,19 @@ statistics_router = APIRouter(prefix="/posts/statistics", tags=["posts"], depend
     ))
 
 @statistics_router.get("/", status_code=200, response_model=StatisticsBlogOutput)
-async def blog_search(
+async def blog_statistics(
         user_id: uuid.UUID = Query(...),
-        statistics_repo: StatisticsRepository[BlogModel] = Depends(get_repo(BlogModel, StatisticsRepository)),
+        statistics_repo: StatisticsRepository[BlogModel] = Depends(get_repo(BlogModel, StatisticsRepository, read_only=True)),
 ):
     average_blog_count = await statistics_repo.get_average_blog_count_per_user(user_id)
-    logger.info("Blog success get list")
+    sampled.info("Blog success get statistics")
     return {"average": average_blog_count}
 
+
+@statistics_router.get("/global", status_code=200, response_model=StatisticsGlobalBlogOutput)
+async def blog_statistics_global(
+        statistics_repo: StatisticsRepository[BlogModel] = Depends(get_repo(BlogModel, StatisticsRepository, read_only=True)),
+):
+    statistics = await statistics_repo.get_global_statistics()
+    sampled.info("Blog success get global statistics")
+    return statistics
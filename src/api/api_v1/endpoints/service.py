@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Depends
+from starlette.exceptions import HTTPException
+
+from src.api.depends import auth_cache
+from src.core import settings
+from src.core.result_cache import result_cache
+from src.core.profiling import ProfiledRoute
+from src.core.secure import WhiteListAPIKeyAuth
+from src.crud import database
+from src.crud.pool import pool_stats
+from src.schemas.service import CacheStatsOutput, PoolStatsOutput, ReplicaRoutingOutput, ResultCacheStatsOutput
+
+router = APIRouter(route_class=ProfiledRoute, prefix="/service", tags=["service"], dependencies=(
+        Depends(WhiteListAPIKeyAuth(
+            whitelist={
+                settings.api.MASTER_KEY
+            }
+        )),
+    ))
+
+
+@router.get("/auth-cache", status_code=200, response_model=CacheStatsOutput)
+async def auth_cache_stats():
+    return auth_cache.stats()
+
+
+@router.get("/cache", status_code=200, response_model=ResultCacheStatsOutput)
+async def result_cache_stats():
+    if result_cache is None:
+        raise HTTPException(404, "Result cache is disabled")
+    return await result_cache.stats()
+
+
+@router.get("/pool", status_code=200, response_model=PoolStatsOutput)
+async def db_pool_stats():
+    return pool_stats(database.engine)
+
+
+
+@router.get("/replicas", status_code=200, response_model=ReplicaRoutingOutput)
+async def db_replicas_status():
+    return database.replica_router.status()
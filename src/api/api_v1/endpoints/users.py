@@ -1,19 +1,25 @@
 import uuid
 
-from fastapi import APIRouter, Depends, Query
-from fastapi.encoders import jsonable_encoder
+from fastapi import APIRouter, Depends, Query, Response
 from loguru import logger
 from sqlalchemy import and_
 from starlette.exceptions import HTTPException
 
-from src.api.depends import get_repo
+from src.api.bulk import BulkList, bulk_results, ensure_unique_ids
+from src.api.depends import get_repo, invalidate_client_auth
+from src.api.pagination import paginate
+from src.api.serialization import FastSerializer
 from src.core import settings
-from src.core.secure import WhiteListAPIKeyAuth, encrypt_token
+from src.core.logs import sampled
+from src.core.profiling import ProfiledRoute
+from src.core.secure import WhiteListAPIKeyAuth, encrypt_token, decrypt_token, token_digest
 from src.crud.repo.base import BaseRepository
 from src.crud.models.user import UserModel
-from src.schemas.user import UserInput, UserOutput
+from src.exceptions.crud import RepoNotFoundException
+from src.schemas.bulk import BulkItemResult, BulkStatusEnum
+from src.schemas.user import UserInput, UserBulkUpdateInput, UserOutput
 
-router = APIRouter(prefix="/clients", tags=["clients"],dependencies=(
+router = APIRouter(route_class=ProfiledRoute, prefix="/clients", tags=["clients"],dependencies=(
         Depends(WhiteListAPIKeyAuth(
             whitelist={
                 settings.api.MASTER_KEY
@@ -21,43 +27,50 @@ router = APIRouter(prefix="/clients", tags=["clients"],dependencies=(
         )),
     ))
 
+user_serializer = FastSerializer(UserOutput, overrides={"token": decrypt_token})
+
 @router.post("/", response_model=UserOutput, status_code=201)
 async def create_clients(
         payload: UserInput,
         repo: BaseRepository[UserModel] = Depends(get_repo(UserModel))
 ):
-    whereclauses = and_(UserModel.name == payload.name, UserModel.token == payload.token)
+    digest = token_digest(payload.token)
+    # The stored token is encrypted, so the raw one is matched through its digest
+    whereclauses = and_(UserModel.name == payload.name, UserModel.token_digest == digest)
     existing_client = await repo.get_by_where(whereclauses)
     if existing_client:
         raise HTTPException(400, "Client with this login already exists")
     encrypted_token = encrypt_token(payload.token)
-    new_client = UserModel(token=encrypted_token, name=payload.name)
+    new_client = UserModel(token=encrypted_token, token_digest=digest, name=payload.name)
     result = await repo.create(new_client)
     logger.info(f"Added new client {result.name}")
-    return result
+    return user_serializer.response(result, status_code=201)
 
 @router.get("/", response_model=UserOutput, status_code=200)
 async def get_clients(
-        repo: BaseRepository[UserModel] = Depends(get_repo(UserModel)),
+        response: Response,
+        repo: BaseRepository[UserModel] = Depends(get_repo(UserModel, read_only=True)),
         id: uuid.UUID = Query(...)
 ):
     existing_client = await repo.get_by_where_one_or_none(UserModel.id == id)
     if existing_client:
-        logger.info(f"Get client {existing_client.name}")
-        return jsonable_encoder(existing_client)
+        sampled.info("Get client {}", existing_client.name)
+        return user_serializer.response(existing_client, response)
     raise HTTPException(400, "Client with this login does not exist")
 
 
 @router.get("/list", response_model=list[UserOutput], status_code=200)
 async def get_clients_list(
-        repo: BaseRepository[UserModel] = Depends(get_repo(UserModel)),
+        response: Response,
+        repo: BaseRepository[UserModel] = Depends(get_repo(UserModel, read_only=True)),
         limit: int = Query(10, ge=1, le=100),
         offset: int = Query(0, ge=0, le=100),
+        cursor: str | None = Query(None),
 ):
-    existing_clients = await repo.get_multi_paginated(offset=offset, limit=limit)
+    existing_clients = await paginate(repo, response, limit, offset, cursor)
     if existing_clients:
-        logger.info(f"Get clients list: Total: {len(existing_clients)}")
-        return jsonable_encoder(existing_clients)
+        sampled.info("Get clients list: Total: {}", len(existing_clients))
+        return user_serializer.response(existing_clients, response)
 
     raise HTTPException(400, "Clients not found")
 
@@ -68,27 +81,77 @@ async def put_clients(
         id: uuid.UUID = Query(...),
         repo: BaseRepository[UserModel] = Depends(get_repo(UserModel))
 ):
-    existing_client = await repo.get_by_where_one_or_none(UserModel.id == id)
-    if not existing_client:
+    encrypted_token = encrypt_token(payload.token)
+    try:
+        updated_client = await repo.update(id, {
+            "name": payload.name,
+            "token": encrypted_token,
+            "token_digest": token_digest(payload.token),
+        })
+    except RepoNotFoundException:
         logger.warning(f"Client with this login does not exist: {payload.name}")
         raise HTTPException(400, "Client with this login does not exist")
-
-    encrypted_token = encrypt_token(payload.token)
-    updated_client = UserModel(name=payload.name, token=encrypted_token, id=id)
-    await repo.update(existing_client.id, updated_client)
+    await invalidate_client_auth(repo, [id])
     logger.info(f"Updated client {payload.name}")
-    return updated_client
+    return user_serializer.response(updated_client, status_code=201)
 
 @router.delete("/", status_code=200)
 async def delete_clients(
         id: uuid.UUID = Query(...),
         repo: BaseRepository[UserModel] = Depends(get_repo(UserModel))
 ):
-    existing_client = await repo.get_by_where_one_or_none(UserModel.id == id)
-    if not existing_client:
+    try:
+        await repo.delete(id)
+    except RepoNotFoundException:
         logger.warning(f"Client with this login does not exist: {id}")
         raise HTTPException(400, "Client with this login does not exist")
-
-    await repo.delete(existing_client.id)
+    await invalidate_client_auth(repo, [id])
     logger.info(f"Deleted client {id}")
     return 200
+
+
+@router.post("/bulk", response_model=list[BulkItemResult[UserOutput]], status_code=200)
+async def create_clients_bulk(
+        payload: BulkList[UserInput],
+        repo: BaseRepository[UserModel] = Depends(get_repo(UserModel))
+):
+    rows = [
+        {"id": uuid.uuid4(), "name": item.name, "token": encrypt_token(item.token), "token_digest": token_digest(item.token)}
+        for item in payload
+    ]
+    errors = {}
+    created = await repo.create_many(rows, on_conflict_do_nothing=True, errors=errors)
+    logger.info(f"Added clients in bulk: {len(created)} of {len(rows)}")
+    return bulk_results([row["id"] for row in rows], {client.id: client for client in created},
+                        BulkStatusEnum.created, BulkStatusEnum.conflict, errors)
+
+
+@router.patch("/bulk", response_model=list[BulkItemResult[UserOutput]], status_code=200)
+async def put_clients_bulk(
+        payload: BulkList[UserBulkUpdateInput],
+        repo: BaseRepository[UserModel] = Depends(get_repo(UserModel))
+):
+    ids = [item.id for item in payload]
+    ensure_unique_ids(ids)
+    updated = await repo.update_many([
+        {"id": item.id, "name": item.name, "token": encrypt_token(item.token), "token_digest": token_digest(item.token)}
+        for item in payload
+    ])
+    await invalidate_client_auth(repo, [client.id for client in updated])
+    logger.info(f"Updated clients in bulk: {len(updated)} of {len(ids)}")
+    return bulk_results(ids, {client.id: client for client in updated},
+                        BulkStatusEnum.updated, BulkStatusEnum.not_found)
+
+
+@router.delete("/bulk", response_model=list[BulkItemResult[None]], status_code=200)
+async def delete_clients_bulk(
+        payload: BulkList[uuid.UUID],
+        repo: BaseRepository[UserModel] = Depends(get_repo(UserModel))
+):
+    ensure_unique_ids(payload)
+    deleted = await repo.delete_many(payload)
+    await invalidate_client_auth(repo, deleted)
+    logger.info(f"Deleted clients in bulk: {len(deleted)} of {len(payload)}")
+    return bulk_results(payload, dict.fromkeys(deleted),
+                        BulkStatusEnum.deleted, BulkStatusEnum.not_found)
+
@@ -0,0 +1,40 @@
+from typing import Annotated, Any, Sequence, TypeVar
+from uuid import UUID
+
+from fastapi import Query
+from pydantic import Field
+from sqlalchemy import exc
+from starlette.exceptions import HTTPException
+
+from src.core import settings
+from src.schemas.bulk import BulkStatusEnum
+
+T = TypeVar('T')
+
+BulkList = Annotated[list[T], Field(min_length=1, max_length=settings.api.BULK_MAX_ITEMS)]
+BatchIds = Annotated[list[UUID], Field(min_length=1, max_length=settings.api.BATCH_MAX_IDS)]
+BatchIdsQuery = Annotated[list[UUID], Query(min_length=1, max_length=settings.api.BATCH_MAX_IDS)]
+
+
+def ensure_unique_ids(ids: Sequence[UUID]) -> None:
+    if len(set(ids)) != len(ids):
+        raise HTTPException(400, "Duplicate ids in bulk request")
+
+
+def bulk_results(ids: Sequence[UUID], done: dict[UUID, Any],
+                 status: BulkStatusEnum, missing_status: BulkStatusEnum,
+                 errors: dict[UUID, exc.DBAPIError] | None = None) -> list[dict]:
+    errors = errors or {}
+    return [
+        {
+            "index": index,
+            "id": id,
+            "status": status if id in done else error_status(errors[id]) if id in errors else missing_status,
+            "data": done.get(id),
+        }
+        for index, id in enumerate(ids)
+    ]
+
+
+def error_status(error: exc.DBAPIError) -> BulkStatusEnum:
+    return BulkStatusEnum.conflict if isinstance(error, exc.IntegrityError) else BulkStatusEnum.failed
@@ -1,49 +1,138 @@
-from typing import AsyncGenerator, Callable
+import functools
+from typing import AsyncGenerator, Awaitable, Callable, Iterable
+from uuid import UUID
 
-from fastapi import Depends
+from fastapi import Depends, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from loguru import logger
-from sqlalchemy import exc
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, exc
 from starlette.exceptions import HTTPException
 
-from src.core.secure import encrypt_token
-from src.crud.database import async_session_factory
+from src.core import settings
+from src.core.cache import TTLCache
+from src.core.logs import sampled
+from src.core.profiling import phase
+from src.core.secure import encrypt_token, token_digest
+from src.crud import database
 from src.crud.models.base import BaseORMModel
 from src.crud.models.user import UserModel
+from src.crud.notifications import notifications, notify
 from src.crud.repo.base import BaseRepository
+from src.crud.unit_of_work import UNIT_OF_WORK, UnitOfWork
+from src.exceptions.crud import RepoNotFoundException
+from src.schemas.user import UserPrincipal
 
 oauth2_scheme = HTTPBearer(auto_error=False)
 
+auth_cache: TTLCache[str, UserPrincipal] = TTLCache(
+    max_size=settings.cache.AUTH_MAX_SIZE,
+    ttl=settings.cache.AUTH_TTL,
+)
+AUTH_INVALIDATION_CHANNEL = "auth_cache_invalidation"
+
+
+def caller_key(request: Request) -> str | None:
+    return request.headers.get("Authorization") or request.headers.get("API")
 
-async def get_db_session() -> AsyncGenerator[AsyncSession, None]:
-    async with async_session_factory() as session:
-        try:
-            yield session
-            await session.commit()
-        except exc.SQLAlchemyError as error:
-            logger.error(error)
-            await session.rollback()
-            raise
 
+async def get_unit_of_work(request: Request) -> AsyncGenerator[UnitOfWork, None]:
+    unit_of_work = UnitOfWork(caller_key(request))
+    try:
+        yield unit_of_work
+        await unit_of_work.commit()
+    except exc.SQLAlchemyError as error:
+        logger.error(error)
+        await unit_of_work.rollback()
+        raise
+    finally:
+        if unit_of_work.has_writes:
+            database.replica_router.mark_write(unit_of_work.caller)
+        await unit_of_work.close()
 
+
+@functools.cache
 def get_repo(
     model: type[BaseORMModel],
-    repo_cls: type[BaseRepository] = BaseRepository
-) -> Callable[[AsyncSession], BaseRepository[BaseORMModel]]:
-    def func(session: AsyncSession = Depends(get_db_session)):
-        logger.debug(f"Get {model.__tablename__} repo")
+    repo_cls: type[BaseRepository] = BaseRepository,
+    read_only: bool = False,
+) -> Callable[[UnitOfWork], Awaitable[BaseRepository[BaseORMModel]]]:
+    # Cached, so that the same arguments give the same dependency and FastAPI builds the repo
+    # once per request; all repos of a request share its unit of work
+    async def func(unit_of_work: UnitOfWork = Depends(get_unit_of_work)):
+        sampled.debug("Get {} repo", model.__tablename__)
+        session = await unit_of_work.read_session() if read_only else unit_of_work.session
         return repo_cls(model, session)
     return func
 
 
-async def get_current_user(token: HTTPAuthorizationCredentials = Depends(oauth2_scheme), repo: BaseRepository[UserModel] = Depends(get_repo(UserModel))) -> UserModel:
-    logger.debug(f"Get current user with token {token}")
+async def upgrade_legacy_client(repo: BaseRepository[UserModel], credentials: str, digest: str) -> UserModel:
+    # Clients written without a digest, e.g. by an instance still running the previous release
+    legacy_client = await repo.get_by_where_one_or_none(and_(
+        UserModel.token_digest.is_(None),
+        UserModel.token == encrypt_token(credentials),
+    ))
+    logger.info(f"Filling in token digest of client {legacy_client.id}")
+    return await repo.update(legacy_client.id, {"token_digest": digest})
+
+
+async def get_current_user(token: HTTPAuthorizationCredentials = Depends(oauth2_scheme), repo: BaseRepository[UserModel] = Depends(get_repo(UserModel))) -> UserPrincipal:
+    with phase("auth"):
+        return await authenticate(token, repo)
+
+
+async def authenticate(token: HTTPAuthorizationCredentials | None, repo: BaseRepository[UserModel]) -> UserPrincipal:
+    logger.debug("Get current user with token {}", token)
     if not token:
         raise HTTPException(429, "Client token missing")
-    existing_client = await repo.get_by_where_one_or_none(UserModel.token == encrypt_token(token.credentials))
+    digest = token_digest(token.credentials)
+    principal = auth_cache.get(digest)
+    if principal is not None:
+        sampled.debug("User with token {} found in auth cache", token)
+        return principal
+    try:
+        existing_client = await repo.get_by_where_one_or_none(UserModel.token_digest == digest)
+    except RepoNotFoundException:
+        if not settings.security.LEGACY_TOKEN_LOOKUP:
+            raise
+        existing_client = await upgrade_legacy_client(repo, token.credentials, digest)
     if existing_client:
-        logger.debug(f"User with token {token} success was found")
-        return existing_client
-    logger.debug(f"User with token {token} not found")
-    raise HTTPException(429, "Invalid token or client not authenticated")
\ No newline at end of file
+        logger.debug("User with token {} success was found", token)
+        principal = UserPrincipal(id=existing_client.id, name=existing_client.name)
+        auth_cache.set(digest, principal)
+        return principal
+    logger.debug("User with token {} not found", token)
+    raise HTTPException(429, "Invalid token or client not authenticated")
+
+
+def drop_client_auth(client_ids: Iterable[UUID]) -> None:
+    client_ids = set(client_ids)
+    dropped = auth_cache.invalidate_where(lambda principal: principal.id in client_ids)
+    logger.debug(f"Dropped {dropped} auth cache entries of clients {', '.join(map(str, client_ids))}")
+
+
+async def _drop_client_auth_after_commit(client_ids: list[UUID]) -> None:
+    drop_client_auth(client_ids)
+
+
+async def invalidate_client_auth(repo: BaseRepository[UserModel], client_ids: Iterable[UUID]) -> None:
+    """Drops cached principals of changed or deleted clients, here and in the other workers."""
+    client_ids = list(client_ids)
+    if not client_ids:
+        return
+    # Dropped only after the commit: before it, a concurrent request still reads and re-caches the old client
+    unit_of_work = repo.session.info.get(UNIT_OF_WORK)
+    if unit_of_work is None:
+        drop_client_auth(client_ids)
+    else:
+        unit_of_work.after_commit(functools.partial(_drop_client_auth_after_commit, client_ids))
+    if settings.cache.AUTH_NOTIFY:
+        await notify(repo.session, AUTH_INVALIDATION_CHANNEL, [str(client_id) for client_id in client_ids])
+
+
+if settings.cache.AUTH_NOTIFY:
+    # Clients changed while not listening are unknown, so the whole cache goes on every (re)connect
+    notifications.listen(
+        AUTH_INVALIDATION_CHANNEL,
+        lambda payload: drop_client_auth(UUID(client_id) for client_id in payload.split(",")),
+        on_connect=auth_cache.clear,
+    )
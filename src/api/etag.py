@@ -0,0 +1,94 @@
+import hashlib
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Sequence
+from uuid import UUID
+
+from fastapi import Request, Response
+
+from src.api.pagination import NEXT_CURSOR_HEADER
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+VALIDATOR_HEADERS = ("ETag", "Last-Modified", NEXT_CURSOR_HEADER)
+
+
+def version_of(item: Any) -> datetime:
+    return item.updated_at or item.created_at
+
+
+def _micros(version: datetime) -> int:
+    return (version - EPOCH) // timedelta(microseconds=1)
+
+
+def item_etag(item: Any) -> str:
+    # Id and version are kept readable so If-Match can be turned back into a WHERE condition
+    return f'"{item.id.hex}-{_micros(version_of(item)):x}"'
+
+
+def page_etag(items: Sequence[Any]) -> str:
+    # Covers membership and order of the page as well, so deletions change it too
+    digest = hashlib.blake2b(digest_size=16)
+    for item in items:
+        digest.update(f"{item.id.hex}-{_micros(version_of(item)):x};".encode())
+    return f'"{digest.hexdigest()}"'
+
+
+def set_validators(response: Response, etag: str, last_modified: datetime | None) -> None:
+    response.headers["ETag"] = etag
+    if last_modified is not None:
+        response.headers["Last-Modified"] = format_datetime(last_modified.astimezone(timezone.utc), usegmt=True)
+
+
+def has_conditions(request: Request) -> bool:
+    return "if-none-match" in request.headers or "if-modified-since" in request.headers
+
+
+def _etags(header: str, weak: bool = False) -> list[str]:
+    tags = [tag.strip() for tag in header.split(",")]
+    return [tag.removeprefix("W/") for tag in tags] if weak else tags
+
+
+def is_not_modified(request: Request, etag: str, last_modified: datetime | None) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-Modified-Since is ignored when If-None-Match is present
+        tags = _etags(if_none_match, weak=True)
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    # HTTP dates have a one second resolution
+    return last_modified.replace(microsecond=0) <= since
+
+
+def not_modified(response: Response) -> Response:
+    return Response(
+        status_code=304,
+        headers={name: response.headers[name] for name in VALIDATOR_HEADERS if name in response.headers},
+    )
+
+
+def if_match_versions(request: Request, id: UUID) -> list[datetime] | None:
+    """Versions of the resource accepted by If-Match, None when any version is."""
+    if_match = request.headers.get("if-match")
+    if if_match is None:
+        return None
+    tags = _etags(if_match)
+    if "*" in tags:
+        return None
+    versions = []
+    for tag in tags:
+        tag_id, _, micros = tag.strip('"').partition("-")
+        if tag_id != id.hex:
+            continue
+        try:
+            versions.append(EPOCH + timedelta(microseconds=int(micros, 16)))
+        except ValueError:
+            continue
+    return versions
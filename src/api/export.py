@@ -0,0 +1,70 @@
+import csv
+import io
+import zlib
+from enum import Enum
+from typing import AsyncIterator, Callable, Sequence
+
+import ujson
+from sqlalchemy.engine import Row
+
+from src.crud.repo.pagination import encode_cursor
+
+EXPORT_FIELDS = ("id", "title", "content", "created_at", "updated_at", "cursor")
+
+
+class ExportFormatEnum(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+
+EXPORT_MEDIA_TYPES = {
+    ExportFormatEnum.ndjson: "application/x-ndjson",
+    ExportFormatEnum.csv: "text/csv",
+}
+
+
+def _record(row: Row) -> tuple:
+    return (
+        str(row.id),
+        row.title,
+        row.content,
+        row.created_at.isoformat() if row.created_at else None,
+        row.updated_at.isoformat() if row.updated_at else None,
+        encode_cursor([row.created_at, row.id]),
+    )
+
+
+def _ndjson_chunk(rows: Sequence[Row]) -> bytes:
+    return "".join(ujson.dumps(dict(zip(EXPORT_FIELDS, _record(row)))) + "\n" for row in rows).encode()
+
+
+def _csv_chunk(rows: Sequence[Row]) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(_record(row) for row in rows)
+    return buffer.getvalue().encode()
+
+
+def _csv_header() -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(EXPORT_FIELDS)
+    return buffer.getvalue().encode()
+
+
+async def export_chunks(partitions: AsyncIterator[Sequence[Row]], export_format: ExportFormatEnum,
+                        gzip: bool = False) -> AsyncIterator[bytes]:
+    encode: Callable[[Sequence[Row]], bytes] = _ndjson_chunk
+    compressor = zlib.compressobj(wbits=31) if gzip else None
+
+    def emit(chunk: bytes) -> bytes:
+        if compressor is None:
+            return chunk
+        # Sync flush keeps every chunk decodable as soon as it arrives
+        return compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    if export_format == ExportFormatEnum.csv:
+        encode = _csv_chunk
+        yield emit(_csv_header())
+    async for rows in partitions:
+        yield emit(encode(rows))
+    if compressor is not None:
+        yield compressor.flush()
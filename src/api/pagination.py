@@ -0,0 +1,38 @@
+from typing import Hashable, Sequence
+
+from fastapi import Response
+from sqlalchemy.engine import Row
+from sqlalchemy.sql.elements import ClauseElement, ColumnElement
+from starlette.exceptions import HTTPException
+
+from src.crud.repo.base import BaseRepository, BaseModel
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+async def paginate(
+        repo: BaseRepository[BaseModel],
+        response: Response,
+        limit: int,
+        offset: int = 0,
+        cursor: str | None = None,
+        whereclause: ClauseElement | None = None,
+        cache_scope: Hashable | None = None,
+        versions_only: bool = False,
+        projection: Sequence[ColumnElement] | None = None,
+) -> list[BaseModel] | list[Row]:
+    if offset and cursor is not None:
+        raise HTTPException(400, "Use either offset or cursor, not both")
+    if versions_only:
+        items = await repo.get_page_versions(limit, offset, cursor, whereclause=whereclause)
+        next_cursor = repo.cursor_of(items[-1]) if len(items) == limit else None
+    elif projection is not None:
+        items, next_cursor = await repo.get_page_projected(projection, limit, offset, cursor, whereclause=whereclause)
+    elif offset:
+        items = await repo.get_multi_paginated(offset, limit, whereclause=whereclause, cache_scope=cache_scope)
+        next_cursor = repo.cursor_of(items[-1]) if len(items) == limit else None
+    else:
+        items, next_cursor = await repo.get_multi_keyset(limit, cursor, whereclause=whereclause, cache_scope=cache_scope)
+    if next_cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return items
@@ -0,0 +1,41 @@
+from typing import Sequence
+
+from pydantic import BaseModel
+from sqlalchemy.sql.elements import ColumnElement
+from starlette.exceptions import HTTPException
+
+from src.api.serialization import FastSerializer
+
+
+class Projection:
+    """Output fields of a listing chosen with fields=: a preset name or a comma separated list.
+
+    Every field is a SQL expression, so the SELECT reads only what the response shows,
+    and each field set gets its serializer over a schema where all fields are optional.
+    """
+
+    def __init__(self, schema: type[BaseModel], columns: dict[str, ColumnElement],
+                 presets: dict[str, tuple[str, ...]]):
+        self.schema = schema
+        self.columns = columns
+        self.presets = presets
+        self._serializers: dict[tuple[str, ...], FastSerializer] = {}
+
+    def fields_of(self, fields: str) -> tuple[str, ...]:
+        names = self.presets.get(fields)
+        if names is None:
+            names = tuple(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+        unknown = [name for name in names if name not in self.columns]
+        if unknown or not names:
+            problem = f"Unknown fields {', '.join(unknown)}" if unknown else "No fields"
+            raise HTTPException(400, f"{problem}; use {', '.join(self.presets)} or some of {', '.join(self.columns)}")
+        return names
+
+    def select_columns(self, names: Sequence[str]) -> list[ColumnElement]:
+        return [self.columns[name].label(name) for name in names]
+
+    def serializer(self, names: tuple[str, ...]) -> FastSerializer:
+        serializer = self._serializers.get(names)
+        if serializer is None:
+            serializer = self._serializers[names] = FastSerializer(self.schema, fields=names)
+        return serializer
@@ -0,0 +1,174 @@
+import atexit
+import json
+import random
+import re
+import sys
+import threading
+import traceback
+import uuid
+from collections import deque
+from typing import Callable, TextIO
+
+from loguru import logger
+from sqlalchemy.sql.elements import ClauseElement
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.core.metrics import CollectedMetric, registry
+from src.core.settings import LogConfig
+
+REQUEST_ID_HEADER = b"x-request-id"
+_REQUEST_ID_RE = re.compile(rb"[A-Za-z0-9._\-]{1,128}")
+
+TEXT_FORMAT = (
+    "{time:YYYY-MM-DD HH:mm:ss.SSS} | {level: <8} | {extra[request_id]} | "
+    "{name}:{function}:{line} - {message}"
+)
+
+# High-volume lines (per-query and per-request ones) are kept with probability LOG__SAMPLE_RATE
+sampled = logger.bind(sampled=True)
+_sample_rate = 1.0
+_sink: "QueueSink | SyncSink | None" = None
+
+
+def _json_line(message) -> str:
+    record = message.record
+    line = {
+        "time": record["time"].isoformat(),
+        "level": record["level"].name,
+        "message": record["message"],
+        "logger": record["name"],
+        "function": record["function"],
+        "line": record["line"],
+    }
+    line.update((key, value) for key, value in record["extra"].items() if key != "sampled")
+    if record["exception"] is not None:
+        line["exception"] = "".join(traceback.format_exception(*record["exception"]))
+    return json.dumps(line, default=str, ensure_ascii=False) + "\n"
+
+
+class QueueSink:
+    """Hands messages to a writer thread through a bounded queue.
+
+    The writer wakes up every FLUSH_INTERVAL and writes whatever piled up in one go;
+    JSON lines are rendered there too. When the queue is full, messages below
+    WARNING are dropped instead of blocking the event loop. stop() writes out what is
+    left; messages that come after it are written directly.
+    """
+    FLUSH_INTERVAL = 0.05
+
+    def __init__(self, stream: TextIO, render: Callable[[str], str], max_size: int):
+        self.stream = stream
+        self.render = render
+        self.max_size = max_size
+        # deque appends and pops are atomic, so the hot path takes no lock
+        self.queue: deque = deque()
+        self.dropped = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self.thread.start()
+
+    def write(self, message) -> None:
+        if self.stopped.is_set():
+            self.stream.write(self.render(message))
+            self.stream.flush()
+            return
+        if len(self.queue) >= self.max_size and message.record["level"].no < 30:
+            self.dropped += 1
+            return
+        self.queue.append(message)
+
+    def stop(self) -> None:
+        self.stopped.set()
+        self.thread.join()
+
+    def _drain(self) -> None:
+        if not self.queue:
+            return
+        while self.queue:
+            messages = [self.queue.popleft() for _ in range(min(len(self.queue), 1000))]
+            self.stream.write("".join(self.render(message) for message in messages))
+        self.stream.flush()
+
+    def _run(self) -> None:
+        while not self.stopped.wait(self.FLUSH_INTERVAL):
+            self._drain()
+        self._drain()
+
+
+class SyncSink:
+    def __init__(self, stream: TextIO, render: Callable[[str], str]):
+        self.stream = stream
+        self.render = render
+
+    def write(self, message) -> None:
+        self.stream.write(self.render(message))
+        self.stream.flush()
+
+
+def _sample_filter(rate: float) -> Callable[[dict], bool]:
+    def keep(record: dict) -> bool:
+        return not record["extra"].get("sampled") or random.random() < rate
+    return keep
+
+
+def log_query(query: ClauseElement) -> None:
+    # Sampled before the call: loguru evaluates lazy arguments before filters run,
+    # and compiling the statement is the expensive part
+    if _sample_rate < 1 and random.random() >= _sample_rate:
+        return
+    logger.opt(lazy=True, depth=1).debug("Query: {}", lambda: str(query))
+
+
+def configure_logging(config: LogConfig, debug: bool, stream: TextIO = sys.stderr) -> QueueSink | SyncSink:
+    global _sample_rate, _sink
+    render = _json_line if config.JSON else str
+    logger.remove()
+    # The previous writer thread writes out its queue and ends instead of running on idle
+    stop_logging()
+    sink = QueueSink(stream, render, config.QUEUE_SIZE) if config.QUEUE else SyncSink(stream, render)
+    _sample_rate, _sink = config.SAMPLE_RATE, sink
+    logger.configure(extra={"request_id": "-"})
+    logger.add(
+        sink,
+        level=config.LEVEL or ("DEBUG" if debug else "INFO"),
+        format="{message}" if config.JSON else TEXT_FORMAT,
+        filter=_sample_filter(config.SAMPLE_RATE) if config.SAMPLE_RATE < 1 else None,
+        colorize=False,
+    )
+    return sink
+
+
+def stop_logging() -> None:
+    """Writes out the queued lines; runs at exit, so the last lines and fatal errors are not lost."""
+    if isinstance(_sink, QueueSink):
+        _sink.stop()
+
+
+atexit.register(stop_logging)
+
+registry.register(CollectedMetric(
+    "log_messages_dropped_total", "Log messages dropped because the log queue was full", (),
+    lambda: [((), getattr(_sink, "dropped", 0))], type="counter",
+))
+
+
+class RequestIdMiddleware:
+    """Binds X-Request-ID (taken from the request or generated) to every log line of the request."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        incoming = dict(scope["headers"]).get(REQUEST_ID_HEADER, b"")
+        request_id = incoming if _REQUEST_ID_RE.fullmatch(incoming) else uuid.uuid4().hex.encode()
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []), (REQUEST_ID_HEADER, request_id)]}
+            await send(message)
+
+        with logger.contextualize(request_id=request_id.decode()):
+            await self.app(scope, receive, send_wrapper)
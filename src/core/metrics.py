@@ -0,0 +1,269 @@
+import asyncio
+import os
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Iterable
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.core.settings import settings
+
+# Repository method that issued the current database query
+QUERY_SOURCE_DEFAULT = "other"
+query_source: ContextVar[str] = ContextVar("query_source", default=QUERY_SOURCE_DEFAULT)
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+Sample = tuple[tuple[str, ...], float]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metric:
+    type: str
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+
+    def render(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        super().__init__(name, help, labels)
+        self.values: dict[tuple[str, ...], float] = {}
+        if not labels:
+            self.values[()] = 0.0
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def render(self) -> list[str]:
+        return self.header() + [
+            f"{self.name}{_labels(self.label_names, labels)} {_number(value)}"
+            for labels, value in self.values.items()
+        ]
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = REQUEST_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = buckets
+        # Per label set: non-cumulative bucket counts (last one is +Inf), sum
+        self.values: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self.values.get(labels)
+        if series is None:
+            series = self.values[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1][0] += value
+
+    def render(self) -> list[str]:
+        lines = self.header()
+        for labels, (counts, total) in self.values.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                bucket_labels = _labels(self.label_names, labels, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {_number(total[0])}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+
+class CollectedMetric(Metric):
+    """Gauge or counter whose samples are read from a callback at scrape time."""
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...], collect: Callable[[], Iterable[Sample]],
+                 type: str = "gauge"):
+        super().__init__(name, help, labels)
+        self.collect = collect
+        self.type = type
+
+    def render(self) -> list[str]:
+        return self.header() + [
+            f"{self.name}{_labels(self.label_names, labels)} {_number(value)}"
+            for labels, value in self.collect()
+        ]
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: list[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class MultiProcessRegistry:
+    """Metrics of all worker processes of one server, added up at scrape time.
+
+    Every worker writes the rendering of its registry to <directory>/<pid>.prom every
+    WRITE_INTERVAL seconds and when it is scraped, so the other workers' part of a scrape
+    is up to WRITE_INTERVAL old. Equal series of all files are summed. Gauges of workers
+    that exited are left out; their counters and histograms are kept, so totals do not
+    go down when a worker is replaced.
+    """
+    WRITE_INTERVAL = 1.0
+    SUFFIX = ".prom"
+
+    def __init__(self, registry: Registry, directory: str):
+        self.registry = registry
+        self.directory = directory
+
+    def write(self) -> None:
+        # The pid is read every time: the module may have been imported before the worker was forked
+        path = os.path.join(self.directory, f"{os.getpid()}{self.SUFFIX}")
+        with open(path + ".tmp", "w") as file:
+            file.write(self.registry.render())
+        os.replace(path + ".tmp", path)
+
+    async def run(self) -> None:
+        while True:
+            self.write()
+            await asyncio.sleep(self.WRITE_INTERVAL)
+
+    def render(self) -> str:
+        self.write()
+        # Per family: HELP and TYPE lines, type, summed samples
+        families: dict[str, tuple[list[str], list[str], dict[str, float]]] = {}
+        for file_name in sorted(os.listdir(self.directory)):
+            if not file_name.endswith(self.SUFFIX):
+                continue
+            alive = _alive(int(file_name.removesuffix(self.SUFFIX)))
+            try:
+                with open(os.path.join(self.directory, file_name)) as file:
+                    lines = file.read().splitlines()
+            except FileNotFoundError:
+                continue
+            family = None
+            for line in lines:
+                if line.startswith("# "):
+                    parts = line.split(" ", 3)
+                    kind, name, rest = parts[1], parts[2], parts[3] if len(parts) > 3 else ""
+                    family = families.setdefault(name, ([], [], {}))
+                    if kind == "TYPE" and not family[1]:
+                        family[0].append(line)
+                        family[1].append(rest)
+                    elif kind == "HELP" and not family[0]:
+                        family[0].append(line)
+                    continue
+                if family is None or (not alive and family[1] == ["gauge"]):
+                    continue
+                series, _, value = line.rpartition(" ")
+                family[2][series] = family[2].get(series, 0.0) + float(value)
+        lines = []
+        for header, _, samples in families.values():
+            lines.extend(header)
+            lines.extend(f"{series} {_number(value)}" for series, value in samples.items())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+multiprocess = MultiProcessRegistry(registry, settings.run.METRICS_DIR) if settings.run.METRICS_DIR else None
+
+
+def render_metrics() -> str:
+    return multiprocess.render() if multiprocess is not None else registry.render()
+
+HTTP_REQUEST_SECONDS: Histogram = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route", "status"),
+))
+HTTP_REQUESTS_IN_FLIGHT: Gauge = registry.register(Gauge(
+    "http_requests_in_flight", "HTTP requests being served",
+))
+DB_QUERY_SECONDS: Histogram = registry.register(Histogram(
+    "db_query_duration_seconds", "Database query latency by repository method", ("method",), QUERY_BUCKETS,
+))
+DB_QUERY_ERRORS: Counter = registry.register(Counter(
+    "db_query_errors_total", "Failed database queries by repository method", ("method",),
+))
+DB_QUERIES_SHARED: Counter = registry.register(Counter(
+    "db_queries_shared_total", "Reads answered by an identical query already in flight", ("method",),
+))
+
+
+class MetricsMiddleware:
+    """Plain ASGI middleware: one histogram observation per request, labelled by route template."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = "500"
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            # The router stores the matched route in the scope; unmatched paths share one label
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - started,
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                status,
+            )
@@ -0,0 +1,226 @@
+import asyncio
+import functools
+import hmac
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+from fastapi.routing import APIRoute
+from loguru import logger
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.core.settings import settings
+
+PROFILE_HEADER = b"x-profile"
+MASTER_KEY_HEADER = b"api"
+
+
+class RequestProfile:
+    def __init__(self, method: str, path: str, forced: bool):
+        self.method = method
+        self.path = path
+        self.forced = forced
+        self.started = time.perf_counter()
+        self.phases: dict[str, float] = {}
+        self.marks: dict[str, float] = {}
+        self.samples: Counter[str] = Counter()
+
+    def add(self, phase: str, seconds: float) -> None:
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def mark(self, name: str) -> None:
+        self.marks[name] = time.perf_counter()
+
+    def breakdown(self) -> dict[str, float]:
+        phases = dict(self.phases)
+        endpoint_started = self.marks.get("endpoint_started")
+        if endpoint_started is not None:
+            phases["dependencies"] = endpoint_started - self.started
+            phases["endpoint"] = self.marks.get("endpoint_finished", endpoint_started) - endpoint_started
+        response_started = self.marks.get("response_started")
+        if response_started is not None:
+            # response_model validation and serialization happen between the endpoint and the response
+            after_endpoint = response_started - self.marks.get("endpoint_finished", response_started)
+            phases["serialize"] = phases.get("serialize", 0.0) + after_endpoint
+        phases["total"] = self.marks.get("finished", time.perf_counter()) - self.started
+        return phases
+
+    def server_timing(self) -> str:
+        return ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.breakdown().items())
+
+
+current_profile: ContextVar[RequestProfile | None] = ContextVar("current_profile", default=None)
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    profile = current_profile.get()
+    if profile is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add(name, time.perf_counter() - started)
+
+
+def add_phase_time(name: str, seconds: float) -> None:
+    profile = current_profile.get()
+    if profile is not None:
+        profile.add(name, seconds)
+
+
+def mark(name: str) -> None:
+    profile = current_profile.get()
+    if profile is not None:
+        profile.mark(name)
+
+
+def _folded(frame) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class StackSampler:
+    """Samples the event loop thread's stack while at least one request is profiled.
+
+    All requests share the loop thread, so a profile also contains the frames of
+    requests that ran concurrently with it.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.profiles: set[RequestProfile] = set()
+        self.lock = threading.Lock()
+        self.thread: threading.Thread | None = None
+        self.target_thread_id: int | None = None
+
+    def add(self, profile: RequestProfile) -> None:
+        with self.lock:
+            self.profiles.add(profile)
+            if self.thread is None:
+                self.target_thread_id = threading.get_ident()
+                self.thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self.thread.start()
+
+    def remove(self, profile: RequestProfile) -> None:
+        with self.lock:
+            self.profiles.discard(profile)
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            with self.lock:
+                if not self.profiles:
+                    self.thread = None
+                    return
+                profiles = list(self.profiles)
+            frame = sys._current_frames().get(self.target_thread_id)
+            if frame is None:
+                continue
+            stack = _folded(frame)
+            for profile in profiles:
+                profile.samples[stack] += 1
+
+
+class ProfiledRoute(APIRoute):
+    """Marks when the endpoint starts and ends, so dependency resolution can be told apart."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        endpoint = self.dependant.call
+        if not asyncio.iscoroutinefunction(endpoint):
+            return
+
+        @functools.wraps(endpoint)
+        async def marked(*args, **kwargs):
+            mark("endpoint_started")
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                mark("endpoint_finished")
+
+        self.dependant.call = marked
+
+
+def write_profile(directory: str, profile: RequestProfile, route: str) -> str:
+    os.makedirs(directory, exist_ok=True)
+    breakdown = profile.breakdown()
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{profile.method}-{slug}-{breakdown['total'] * 1000:.0f}ms"
+    path = os.path.join(directory, name)
+    # Folded stacks ("frame;frame;frame count") are read by flamegraph.pl, inferno and speedscope
+    with open(f"{path}.folded", "w") as file:
+        for stack, count in dict(profile.samples).items():
+            file.write(f"{stack} {count}\n")
+    with open(f"{path}.json", "w") as file:
+        json.dump({"method": profile.method, "path": profile.path, "route": route, "phases": breakdown}, file)
+    return path
+
+
+class ProfilingMiddleware:
+    """Profiles a sampled fraction of requests, or any request with X-Profile and the master key.
+
+    Profiles of slow or explicitly requested requests are written to PROFILING_DIR;
+    explicitly requested ones also get a Server-Timing header with the breakdown.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.config = settings.run
+        self.sample_rate = self.config.PROFILING_SAMPLE_RATE if self.config.PROFILING else 0.0
+        self.sampler = StackSampler(self.config.PROFILING_INTERVAL)
+        self.master_key = settings.api.MASTER_KEY.encode()
+
+    def _forced(self, scope: Scope) -> bool:
+        headers = dict(scope["headers"])
+        if PROFILE_HEADER not in headers:
+            return False
+        return hmac.compare_digest(headers.get(MASTER_KEY_HEADER, b""), self.master_key)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        forced = self._forced(scope)
+        if not forced and (not self.sample_rate or random.random() >= self.sample_rate):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope["method"], scope["path"], forced)
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                profile.mark("response_started")
+                if forced:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", profile.server_timing().encode()))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        token = current_profile.set(profile)
+        self.sampler.add(profile)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profile.mark("finished")
+            self.sampler.remove(profile)
+            current_profile.reset(token)
+        total = profile.marks["finished"] - profile.started
+        if forced or total >= self.config.PROFILING_SLOW_SECONDS:
+            route = getattr(scope.get("route"), "path", scope["path"])
+            path = await asyncio.to_thread(write_profile, self.config.PROFILING_DIR, profile, route)
+            logger.info(f"Request profile written to {path}: {profile.server_timing()}")
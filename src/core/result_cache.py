@@ -0,0 +1,202 @@
+import json
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Hashable
+
+from loguru import logger
+
+from src.core.cache import TTLCache
+from src.core.settings import CacheConfig, ResultCacheBackendEnum, settings
+
+
+# Values are JSON, never pickle: anyone able to write to a shared backend could otherwise run
+# code in every worker. Types JSON lacks are stored as {"$<type>": "<text>"}.
+DECODERS: dict[str, Callable[[str], Any]] = {
+    "$uuid": uuid.UUID,
+    "$datetime": datetime.fromisoformat,
+    "$date": date.fromisoformat,
+    "$decimal": Decimal,
+}
+
+
+def _encode_value(value: Any) -> dict[str, str]:
+    if isinstance(value, uuid.UUID):
+        return {"$uuid": str(value)}
+    # datetime before date, it is a subclass
+    if isinstance(value, datetime):
+        return {"$datetime": value.isoformat()}
+    if isinstance(value, date):
+        return {"$date": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"$decimal": str(value)}
+    raise TypeError(f"Result cache cannot store {type(value).__name__}")
+
+
+def _decode_object(obj: dict[str, Any]) -> Any:
+    if len(obj) == 1:
+        tag, text = next(iter(obj.items()))
+        if tag in DECODERS:
+            return DECODERS[tag](text)
+    return obj
+
+
+def encode(value: Any) -> bytes:
+    return json.dumps(value, default=_encode_value, separators=(",", ":")).encode()
+
+
+def decode(data: bytes) -> Any:
+    return json.loads(data, object_hook=_decode_object)
+
+
+class CacheBackend:
+    name: str
+
+    async def get_many(self, keys: list[str]) -> list[bytes | None]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: bytes, if_absent: bool = False) -> None:
+        raise NotImplementedError
+
+    async def stats(self) -> dict[str, int]:
+        raise NotImplementedError
+
+
+class MemoryCacheBackend(CacheBackend):
+    name = "memory"
+
+    def __init__(self, max_size: int, ttl: float):
+        self.data: TTLCache[str, bytes] = TTLCache(max_size=max_size, ttl=ttl)
+
+    async def get_many(self, keys: list[str]) -> list[bytes | None]:
+        return [self.data.get(key) for key in keys]
+
+    async def set(self, key: str, value: bytes, if_absent: bool = False) -> None:
+        if if_absent and self.data.get(key) is not None:
+            return
+        self.data.set(key, value)
+
+    async def stats(self) -> dict[str, int]:
+        return {
+            "size": len(self.data),
+            "memory_bytes": sum(len(value) for value in self.data.values()),
+        }
+
+
+class RedisCacheBackend(CacheBackend):
+    name = "redis"
+
+    def __init__(self, url: str, ttl: float):
+        try:
+            from redis import asyncio as redis
+        except ImportError as error:
+            raise RuntimeError("CACHE__RESULT_BACKEND=redis requires the redis package") from error
+        self.client = redis.Redis.from_url(url)
+        self.ttl = max(int(ttl), 1)
+
+    async def get_many(self, keys: list[str]) -> list[bytes | None]:
+        return await self.client.mget(keys)
+
+    async def set(self, key: str, value: bytes, if_absent: bool = False) -> None:
+        await self.client.set(key, value, ex=self.ttl, nx=if_absent)
+
+    async def stats(self) -> dict[str, int]:
+        memory = await self.client.info("memory")
+        return {
+            "size": await self.client.dbsize(),
+            "memory_bytes": memory["used_memory"],
+        }
+
+
+class ResultCache:
+    """Read results keyed by namespace, scope and query.
+
+    Every namespace and scope has a generation token that is part of the entry
+    keys. Invalidation replaces the token, so the old entries are never read
+    again and age out of the backend; a token that expired or was evicted is
+    simply replaced by a new one.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.errors = 0
+
+    async def _generations(self, namespace: str, scope: Hashable) -> str:
+        keys = [f"gen:{namespace}", f"gen:{namespace}:{scope}"]
+        tokens = await self.backend.get_many(keys)
+        for index, token in enumerate(tokens):
+            if token is None:
+                token = uuid.uuid4().hex.encode()
+                await self.backend.set(keys[index], token, if_absent=True)
+                tokens[index] = token
+        return b":".join(tokens).decode()
+
+    async def get(self, namespace: str, scope: Hashable, key: str) -> tuple[str, Any | None]:
+        try:
+            entry_key = f"{namespace}:{scope}:{await self._generations(namespace, scope)}:{key}"
+            value, = await self.backend.get_many([entry_key])
+        except Exception as error:
+            logger.error(f"Result cache read failed: {error}")
+            self.errors += 1
+            return "", None
+        if value is not None:
+            try:
+                rows = decode(value)
+            except Exception as error:
+                # E.g. written by an older release; the entry is replaced by the caller's fresh result
+                logger.warning(f"Result cache entry {entry_key} could not be decoded: {error}")
+                value = None
+        if value is None:
+            self.misses += 1
+            return entry_key, None
+        self.hits += 1
+        return entry_key, rows
+
+    async def set(self, entry_key: str, value: Any) -> None:
+        if not entry_key:
+            return
+        try:
+            await self.backend.set(entry_key, encode(value))
+        except Exception as error:
+            logger.error(f"Result cache write failed: {error}")
+            self.errors += 1
+
+    async def invalidate(self, namespace: str, scope: Hashable | None = None) -> None:
+        # Without a scope the whole namespace is dropped
+        key = f"gen:{namespace}" if scope is None else f"gen:{namespace}:{scope}"
+        try:
+            await self.backend.set(key, uuid.uuid4().hex.encode())
+        except Exception as error:
+            logger.error(f"Result cache invalidation failed: {error}")
+            self.errors += 1
+        self.invalidations += 1
+
+    async def stats(self) -> dict[str, int | float | str]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend.name,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "errors": self.errors,
+            **await self.backend.stats(),
+        }
+
+
+def build_result_cache(config: CacheConfig) -> ResultCache | None:
+    if config.RESULT_BACKEND == ResultCacheBackendEnum.memory:
+        backend = MemoryCacheBackend(max_size=config.RESULT_MAX_SIZE, ttl=config.RESULT_TTL)
+    elif config.RESULT_BACKEND == ResultCacheBackendEnum.redis:
+        backend = RedisCacheBackend(config.REDIS_URL, ttl=config.RESULT_TTL)
+    else:
+        return None
+    return ResultCache(backend, ttl=config.RESULT_TTL)
+
+
+result_cache = build_result_cache(settings.cache)
@@ -1,3 +1,6 @@
+import hashlib
+from functools import lru_cache
+
 import jwt
 from fastapi import Request
 from fastapi.security import APIKeyHeader
@@ -29,11 +32,23 @@ class WhiteListAPIKeyAuth(APIKeyHeader):
 
 
 
+# Derived once so the hot path only runs a single keyed BLAKE2b
+_TOKEN_DIGEST_KEY = hashlib.blake2b(
+    settings.security.ENCRYPTION_KEY.encode(), digest_size=32, person=b"token-digest",
+).digest()
+
+
+def token_digest(token: str) -> str:
+    return hashlib.blake2b(token.encode(), key=_TOKEN_DIGEST_KEY, digest_size=32).hexdigest()
+
+
 def encrypt_token(token: str) -> str:
     payload = {'token': token}
     encrypted_token = jwt.encode(payload, settings.security.ENCRYPTION_KEY, algorithm='HS256')
     return encrypted_token
 
+# Tokens are deterministic and immutable, so a decoded token never needs decoding again
+@lru_cache(maxsize=10_000)
 def decrypt_token(encrypted_token: str) -> str:
     try:
         decoded_payload = jwt.decode(encrypted_token, settings.security.ENCRYPTION_KEY, algorithms=['HS256'])
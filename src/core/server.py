@@ -0,0 +1,107 @@
+import os
+import random
+import shutil
+import sys
+import tempfile
+
+import uvicorn
+from loguru import logger
+from uvicorn.supervisors import ChangeReload, Multiprocess
+
+from src.core.settings import ResultCacheBackendEnum, settings
+
+APP = "main:app"
+
+
+class RecyclingConfig(uvicorn.Config):
+    """uvicorn config whose request limit gets a random jitter in every worker process.
+
+    Workers share the load evenly, so with the same limit they would all restart at once.
+    """
+
+    def __init__(self, *args, max_requests_jitter: int = 0, **kwargs):
+        self.max_requests_jitter = max_requests_jitter
+        super().__init__(*args, **kwargs)
+
+    @property
+    def limit_max_requests(self) -> int | None:
+        if not self._max_requests:
+            return None
+        if self._jitter_pid != os.getpid():
+            self._jitter_pid = os.getpid()
+            self._jittered_max_requests = self._max_requests + random.randint(0, self.max_requests_jitter)
+        return self._jittered_max_requests
+
+    @limit_max_requests.setter
+    def limit_max_requests(self, value: int | None) -> None:
+        self._max_requests = value
+        self._jitter_pid = None
+
+
+def shared_metrics_dir(workers: int) -> tuple[str | None, bool]:
+    """Directory the workers write their metrics to and whether the launcher created it."""
+    run = settings.run
+    if not run.METRICS or workers == 1:
+        return run.METRICS_DIR, False
+    if run.METRICS_DIR is None:
+        return tempfile.mkdtemp(prefix="metrics-"), True
+    # Left from an earlier run; its counters would be added to the new ones
+    for name in os.listdir(run.METRICS_DIR):
+        if name.endswith((".prom", ".prom.tmp")):
+            os.remove(os.path.join(run.METRICS_DIR, name))
+    return run.METRICS_DIR, False
+
+
+def serve() -> None:
+    run = settings.run
+    workers = run.worker_count()
+    if workers > 1 and settings.cache.RESULT_BACKEND == ResultCacheBackendEnum.memory:
+        # A write invalidates the memory cache of its own worker only, the others would serve stale pages
+        logger.error("CACHE__RESULT_BACKEND=memory needs RUN__WORKERS=1, use redis with several workers")
+        sys.exit(1)
+    # Read by the workers' settings, e.g. to split DB__MAX_CONNECTIONS between them
+    os.environ["RUN__WORKERS"] = str(workers)
+    metrics_dir, temporary_metrics_dir = shared_metrics_dir(workers)
+    if metrics_dir is not None:
+        os.environ["RUN__METRICS_DIR"] = metrics_dir
+    pool_size, max_overflow = settings.db.pool_limits(workers)
+    logger.info(
+        f"Starting {workers} workers on {run.HOST}:{run.PORT}, "
+        f"DB pool per worker: {pool_size} + {max_overflow} overflow"
+    )
+    config = RecyclingConfig(
+        APP,
+        host=run.HOST,
+        port=run.PORT,
+        workers=workers,
+        reload=run.DEBUG,
+        loop=run.LOOP,
+        http=run.HTTP,
+        backlog=run.BACKLOG,
+        timeout_keep_alive=run.KEEP_ALIVE_SECONDS,
+        limit_max_requests=run.MAX_REQUESTS,
+        max_requests_jitter=run.MAX_REQUESTS_JITTER,
+        timeout_graceful_shutdown=run.GRACEFUL_SHUTDOWN_SECONDS,
+        access_log=run.ACCESS_LOG,
+    )
+    server = uvicorn.Server(config)
+    # Same as uvicorn.run, which cannot take a config object
+    try:
+        if config.should_reload:
+            ChangeReload(config, target=server.run, sockets=[config.bind_socket()]).run()
+        elif config.workers > 1:
+            # Exited workers (MAX_REQUESTS reached or crashed) are replaced by the supervisor
+            Multiprocess(config, target=server.run, sockets=[config.bind_socket()]).run()
+        else:
+            server.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if temporary_metrics_dir:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+    if not server.started and not config.should_reload and config.workers == 1:
+        sys.exit(3)
+
+
+if __name__ == "__main__":
+    serve()
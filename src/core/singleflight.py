@@ -0,0 +1,68 @@
+import asyncio
+from typing import Awaitable, Callable, Generic, Hashable, TypeVar
+
+from src.core.settings import settings
+
+T = TypeVar("T")
+
+
+class _Flight(Generic[T]):
+    def __init__(self, task: asyncio.Task[T]):
+        self.task = task
+        self.followers = 0
+
+
+class SingleFlight:
+    """Runs one call per key at a time; callers of a key already in flight wait for that call.
+
+    The call runs as a task in the context of the first caller (the leader), e.g. on its
+    database session. A follower that is cancelled just stops waiting. A leader that is
+    cancelled lets the call finish when followers wait for it and cancels it otherwise.
+    """
+
+    def __init__(self):
+        self._flights: dict[Hashable, _Flight] = {}
+        self.calls = 0
+        self.shared = 0
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> tuple[T, bool]:
+        """Result of func() or of the call in flight for key, and whether it came from another caller."""
+        flight = self._flights.get(key)
+        if flight is not None:
+            self.shared += 1
+            flight.followers += 1
+            try:
+                return await asyncio.shield(flight.task), True
+            finally:
+                flight.followers -= 1
+
+        self.calls += 1
+        flight = _Flight(asyncio.ensure_future(func()))
+        self._flights[key] = flight
+        flight.task.add_done_callback(lambda _: self._land(key, flight))
+        try:
+            return await asyncio.shield(flight.task), False
+        except asyncio.CancelledError:
+            if not flight.followers:
+                # Removed before the call is cancelled, so a caller arriving while it winds down
+                # starts a call of its own instead of getting the cancellation
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                flight.task.cancel()
+            # The call may use the leader's resources (its session), so it has to be over before
+            # the leader goes; asyncio.wait does not cancel it if the leader is cancelled again
+            await asyncio.wait([flight.task])
+            raise
+
+    def _land(self, key: Hashable, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if not flight.task.cancelled():
+            # Retrieved here, so a failure nobody waited for is not reported as never retrieved
+            flight.task.exception()
+
+
+singleflight = SingleFlight() if settings.db.SINGLEFLIGHT else None
@@ -0,0 +1,80 @@
+import asyncio
+import contextvars
+from uuid import uuid4
+
+from loguru import logger
+from sqlalchemy.exc import DBAPIError
+
+from src.crud import database
+from src.crud.models.base import BaseORMModel
+from src.crud.repo.base import BaseRepository
+from src.exceptions.crud import RepoConflictException
+
+
+class InsertCoalescer:
+    """Groups rows inserted by concurrent requests into one INSERT ... RETURNING and commit.
+
+    A batch is written once it has max_batch_size rows, or max_wait seconds after its first
+    row arrived. If a row makes the batch fail, the rows are retried one by one, so that every
+    caller gets its own row or its own error.
+    """
+
+    def __init__(self, model: type[BaseORMModel], max_batch_size: int, max_wait: float,
+                 repo_cls: type[BaseRepository] = BaseRepository):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.repo_cls = repo_cls
+        self.batches = 0
+        self.rows = 0
+        self._pending: list[tuple[dict, asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._writes: set[asyncio.Task] = set()
+
+    async def insert(self, row: dict) -> BaseORMModel:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        # Ids are assigned up front to match the returned rows to their callers
+        self._pending.append(({"id": uuid4(), **row}, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        # A caller that goes away does not take the batch down with it; its row is still written
+        return await asyncio.shield(future)
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        # A fresh context, so the batch is not logged or profiled as the request that filled it
+        task = asyncio.create_task(self._write(batch), context=contextvars.Context())
+        self._writes.add(task)
+        task.add_done_callback(self._writes.discard)
+
+    async def _write(self, batch: list[tuple[dict, asyncio.Future]]) -> None:
+        try:
+            async with database.async_session_factory() as session:
+                created = await self.repo_cls(self.model, session).create_many([row for row, _ in batch])
+        except (RepoConflictException, DBAPIError) as error:
+            # Any row can fail the batch (a duplicate, a title too long, a deadlock), so it is
+            # retried row by row; only a batch of one row fails its caller
+            if len(batch) == 1:
+                batch[0][1].set_exception(error)
+                return
+            logger.warning(f"Batch of {len(batch)} {self.model.__tablename__} rows failed, inserting them one by one: {type(error).__name__}")
+            for item in batch:
+                await self._write([item])
+            return
+        except Exception as error:
+            for _, future in batch:
+                future.set_exception(error)
+            return
+        self.batches += 1
+        self.rows += len(batch)
+        by_id = {obj.id: obj for obj in created}
+        for row, future in batch:
+            future.set_result(by_id[row["id"]])
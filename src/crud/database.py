@@ -1,10 +1,134 @@
-from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+import time
+import uuid
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, ExceptionContext
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 
 from src.core import settings
+from src.core.profiling import add_phase_time
+from src.core.metrics import DB_QUERY_ERRORS, DB_QUERY_SECONDS, CollectedMetric, query_source, registry
+from src.core.settings import DataBaseConfig
+from .pool import InstrumentedAsyncPool, pool_stats
+from .replicas import ReplicaRouter
+
+
+def engine_options(config: DataBaseConfig, application_name: str | None = None) -> dict:
+    connect_args = {
+        "statement_cache_size": config.STATEMENT_CACHE_SIZE,
+        "command_timeout": config.COMMAND_TIMEOUT,
+        "server_settings": {
+            "application_name": application_name or config.APPLICATION_NAME or settings.api.SERVICE_SLUG,
+        },
+    }
+    if config.PGBOUNCER:
+        connect_args.update(
+            statement_cache_size=0,
+            prepared_statement_cache_size=0,
+            prepared_statement_name_func=lambda: f"__asyncpg_{uuid.uuid4()}__",
+        )
+    # The launcher exports RUN__WORKERS, so every worker takes its share of DB__MAX_CONNECTIONS
+    pool_size, max_overflow = config.pool_limits(settings.run.WORKERS or 1)
+    return {
+        "poolclass": InstrumentedAsyncPool,
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": config.POOL_TIMEOUT,
+        "pool_recycle": config.POOL_RECYCLE,
+        "pool_pre_ping": config.POOL_PRE_PING,
+        "connect_args": connect_args,
+    }
+
+
+def _query_started(conn, cursor, statement, parameters, context, executemany) -> None:
+    context.query_started = time.perf_counter()
+
+
+def _query_finished(conn, cursor, statement, parameters, context, executemany) -> None:
+    elapsed = time.perf_counter() - context.query_started
+    DB_QUERY_SECONDS.observe(elapsed, query_source.get())
+    add_phase_time("sql", elapsed)
+
+
+def _query_failed(context: ExceptionContext) -> None:
+    DB_QUERY_ERRORS.inc(query_source.get())
+
+
+def instrument_engine(sync_engine: Engine) -> None:
+    event.listen(sync_engine, "before_cursor_execute", _query_started)
+    event.listen(sync_engine, "after_cursor_execute", _query_finished)
+    event.listen(sync_engine, "handle_error", _query_failed)
+
+
+def _pool_samples(key: str) -> list[tuple[tuple[str, ...], float]]:
+    engines: list[tuple[str, AsyncEngine]] = [("primary", engine)]
+    engines += [(f"replica-{index}", replica) for index, replica in enumerate(replica_engines)]
+    return [((name,), pool_stats(target).get(key, 0)) for name, target in engines]
+
+
+def register_pool_metrics() -> None:
+    for key, name, metric_type, description in (
+        ("size", "db_pool_size", "gauge", "Configured pool size"),
+        ("checked_out", "db_pool_checked_out", "gauge", "Connections in use"),
+        ("overflow", "db_pool_overflow", "gauge", "Connections opened above the pool size"),
+        ("wait_count", "db_pool_checkouts_total", "counter", "Connection checkouts"),
+        ("wait_time_total", "db_pool_wait_seconds_total", "counter", "Seconds spent waiting for a connection"),
+        ("timeouts", "db_pool_timeouts_total", "counter", "Checkouts that timed out"),
+    ):
+        registry.register(CollectedMetric(
+            name, description, ("engine",), lambda key=key: _pool_samples(key), type=metric_type,
+        ))
+
+
+def _build() -> None:
+    global engine, replica_engines, replica_router, async_session_factory, index_advisor
+    engine = create_async_engine(
+        settings.db.as_dns(),
+        echo=settings.run.DEBUG,
+        **engine_options(settings.db),
+    )
+
+    index_advisor = None
+    if settings.db.INDEX_ADVISOR:
+        from .index_advisor import IndexAdvisor
+        index_advisor = IndexAdvisor(min_rows=settings.db.INDEX_ADVISOR_MIN_ROWS)
+        index_advisor.install(engine)
+
+    replica_engines = [
+        create_async_engine(
+            dsn,
+            echo=settings.run.DEBUG,
+            **engine_options(
+                settings.db,
+                application_name=f"{settings.db.APPLICATION_NAME or settings.api.SERVICE_SLUG}-replica-{index}",
+            ),
+        ).execution_options(postgresql_readonly=True)
+        for index, dsn in enumerate(settings.db.REPLICAS)
+    ]
+
+    replica_router = ReplicaRouter(
+        engine,
+        replica_engines,
+        eject_seconds=settings.db.REPLICA_EJECT_SECONDS,
+        read_your_writes_seconds=settings.db.READ_YOUR_WRITES_SECONDS,
+    )
+
+    instrument_engine(engine.sync_engine)
+    for replica_engine in replica_engines:
+        instrument_engine(replica_engine.sync_engine)
+    register_pool_metrics()
+
+    # Objects returned by UPDATE/DELETE ... RETURNING stay readable after commit
+    async_session_factory = async_sessionmaker(engine, expire_on_commit=False)
+
+
+_LAZY = {"engine", "replica_engines", "replica_router", "async_session_factory", "index_advisor"}
 
-engine = create_async_engine(
-    settings.db.as_dns(),
-    echo=settings.run.DEBUG
-)
 
-async_session_factory = async_sessionmaker(engine)
\ No newline at end of file
+def __getattr__(name: str):
+    # Engines are created on first use, so importing the app does not load the driver;
+    # the lifespan warm-up is normally that first use
+    if name in _LAZY:
+        _build()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
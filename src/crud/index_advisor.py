@@ -0,0 +1,85 @@
+import atexit
+import json
+
+from loguru import logger
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+EXPLAINABLE_STATEMENTS = ("SELECT", "WITH", "UPDATE", "DELETE")
+
+
+class IndexAdvisor:
+    """Development-time check that EXPLAINs every statement sent through an engine.
+
+    Plans are built with enable_seqscan turned off, so a sequential scan that is
+    still chosen means no index can serve the statement, even on the tiny tables
+    of a test database.
+    """
+
+    def __init__(self, min_rows: int = 0):
+        self.min_rows = min_rows
+        self.findings: dict[tuple[str, str], int] = {}
+        self._table_rows: dict[str, float] = {}
+        self._explaining = False
+
+    def install(self, engine: AsyncEngine) -> None:
+        event.listen(engine.sync_engine, "after_cursor_execute", self._after_cursor_execute)
+        atexit.register(self.report)
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if executemany or self._explaining:
+            return
+        if not statement.lstrip().upper().startswith(EXPLAINABLE_STATEMENTS):
+            return
+        self._explaining = True
+        try:
+            plan = self._explain(conn, statement, parameters)
+            if plan is None:
+                return
+            for table in self._seq_scanned_tables(plan[0]["Plan"]):
+                if self._rows(conn, table) >= self.min_rows:
+                    self._flag(table, statement)
+        finally:
+            self._explaining = False
+
+    def _explain(self, conn, statement: str, parameters) -> list[dict] | None:
+        # A failed EXPLAIN must not abort the caller's transaction
+        conn.exec_driver_sql("SAVEPOINT index_advisor")
+        try:
+            conn.exec_driver_sql("SET enable_seqscan = off")
+            plan = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).scalar()
+            conn.exec_driver_sql("RESET enable_seqscan")
+            conn.exec_driver_sql("RELEASE SAVEPOINT index_advisor")
+        except Exception as error:
+            conn.exec_driver_sql("ROLLBACK TO SAVEPOINT index_advisor")
+            logger.warning(f"Index advisor could not explain statement: {error}")
+            return None
+        return json.loads(plan) if isinstance(plan, str) else plan
+
+    def _seq_scanned_tables(self, node: dict) -> set[str]:
+        tables = set()
+        if node.get("Node Type") == "Seq Scan":
+            tables.add(node["Relation Name"])
+        for child in node.get("Plans", ()):
+            tables |= self._seq_scanned_tables(child)
+        return tables
+
+    def _rows(self, conn, table: str) -> float:
+        if table not in self._table_rows:
+            self._table_rows[table] = conn.exec_driver_sql(
+                "SELECT greatest(reltuples, 0) FROM pg_class WHERE relname = $1", (table,)
+            ).scalar() or 0
+        return self._table_rows[table]
+
+    def _flag(self, table: str, statement: str) -> None:
+        key = (table, statement)
+        if key not in self.findings:
+            logger.warning(f"Sequential scan on table {table}, no usable index for: {statement}")
+        self.findings[key] = self.findings.get(key, 0) + 1
+
+    def report(self) -> None:
+        if not self.findings:
+            logger.info("Index advisor: no sequential scans found")
+            return
+        for (table, statement), count in self.findings.items():
+            logger.warning(f"Index advisor: seq scan on {table} ({count} times): {statement}")
@@ -1,2 +1,3 @@
 from .blog import BlogModel
-from .user import UserModel
\ No newline at end of file
+from .user import UserModel
+from .statistics import UserBlogStatsModel
@@ -1,6 +1,6 @@
 import uuid
 
-from sqlalchemy.util.preloaded import orm
+from sqlalchemy import orm
 
 
 class BaseORMModel(orm.DeclarativeBase):
@@ -12,4 +12,4 @@ class BaseORMModel(orm.DeclarativeBase):
     )
 
     def as_dict(self):
-        return {c.name: getattr(self, c.name) for c in self.__table__.columns}
\ No newline at end of file
+        return {c.key: getattr(self, c.key) for c in self.__mapper__.column_attrs}
\ No newline at end of file
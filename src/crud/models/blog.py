@@ -1,7 +1,10 @@
-from sqlalchemy import Column, DateTime, Text, String, ForeignKey, func, UUID
+from sqlalchemy import Column, DateTime, Index, Text, String, ForeignKey, func, text, UUID
+from sqlalchemy.dialects.postgresql import TSVECTOR
 
 from .base import BaseORMModel
 
+SEARCH_CONFIG = 'simple'
+
 
 class BlogModel(BaseORMModel):
     __tablename__ = 'blog'
@@ -12,3 +15,14 @@ class BlogModel(BaseORMModel):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
     user_id = Column(UUID, ForeignKey('user.id'), nullable=False)
+
+    # Weighted tsvector of title (A) and content (B) over SEARCH_CONFIG, filled by the
+    # blog_search_vector trigger (see the 9560824ae4c4 migration)
+    search_vector = Column(TSVECTOR)
+
+    __table_args__ = (
+        Index('ix_blog_search_vector', 'search_vector', postgresql_using='gin'),
+        Index('ix_blog_user_id_created_at_id', 'user_id', text('created_at DESC'), text('id DESC')),
+    )
+    # Only used in WHERE/ORDER BY of search queries, never loaded into instances
+    __mapper_args__ = {'exclude_properties': ['search_vector']}
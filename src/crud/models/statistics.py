@@ -0,0 +1,12 @@
+from sqlalchemy import Column, Integer, ForeignKey, UUID
+
+from .base import BaseORMModel
+
+
+class UserBlogStatsModel(BaseORMModel):
+    """Per-user blog counters, maintained by triggers on the blog and user tables."""
+    __tablename__ = 'user_blog_stats'
+
+    id = None
+    user_id = Column(UUID, ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    blog_count = Column(Integer, nullable=False, server_default='0')
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, UniqueConstraint
+from sqlalchemy import CHAR, Column, String, UniqueConstraint
 from sqlalchemy.orm import relationship
 
 from .base import BaseORMModel
@@ -10,9 +10,12 @@ class UserModel(BaseORMModel):
 
     name = Column(String(255), nullable=False)
     token = Column(String(255), nullable=False)
+    # Keyed BLAKE2b of the raw token, the lookup key for authentication
+    token_digest = Column(CHAR(64), nullable=True)
 
     blogs = relationship(BlogModel, backref='user', lazy=True)
 
     __table_args__ = (
         UniqueConstraint('token', name='token_uc'),
+        UniqueConstraint('token_digest', name='token_digest_uc'),
     )
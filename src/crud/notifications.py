@@ -0,0 +1,108 @@
+import asyncio
+from typing import Callable
+
+from loguru import logger
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.core.settings import DataBaseConfig, settings
+
+# Postgres drops NOTIFY payloads of 8000 bytes and more
+MAX_PAYLOAD_BYTES = 7900
+
+
+class Notifications:
+    """Postgres LISTEN on a dedicated connection, calling the handlers of a channel with every payload.
+
+    Lets every worker process and instance drop what it caches in memory when another one
+    changes the data. Notifications sent while the connection is down are lost, so the
+    on_connect callbacks run after every (re)connect to start from a clean state.
+    """
+    RETRY_MAX_SECONDS = 30
+    CHECK_SECONDS = 30
+
+    def __init__(self, config: DataBaseConfig, application_name: str):
+        self.config = config
+        self.application_name = application_name
+        self.handlers: dict[str, list[Callable[[str], None]]] = {}
+        self.on_connect: list[Callable[[], None]] = []
+        self.connected = asyncio.Event()
+
+    def listen(self, channel: str, handler: Callable[[str], None], on_connect: Callable[[], None] | None = None) -> None:
+        self.handlers.setdefault(channel, []).append(handler)
+        if on_connect is not None:
+            self.on_connect.append(on_connect)
+
+    def _dispatch(self, connection, pid: int, channel: str, payload: str) -> None:
+        for handler in self.handlers.get(channel, ()):
+            try:
+                handler(payload)
+            except Exception as error:
+                logger.exception(f"Handler of notification channel {channel} failed: {error}")
+
+    async def _listen(self) -> None:
+        import asyncpg
+        connection = await asyncpg.connect(
+            host=self.config.HOST,
+            port=self.config.PORT,
+            user=self.config.USER,
+            password=self.config.PASSWORD,
+            database=self.config.NAME,
+            server_settings={"application_name": self.application_name},
+        )
+        try:
+            lost = asyncio.Event()
+            connection.add_termination_listener(lambda _: lost.set())
+            for channel in self.handlers:
+                await connection.add_listener(channel, self._dispatch)
+            for callback in self.on_connect:
+                callback()
+            self.connected.set()
+            while not lost.is_set():
+                try:
+                    await asyncio.wait_for(lost.wait(), self.CHECK_SECONDS)
+                except asyncio.TimeoutError:
+                    # A connection cut without a FIN is only noticed when it is used
+                    await connection.fetchval("SELECT 1", timeout=self.CHECK_SECONDS)
+        finally:
+            self.connected.clear()
+            connection.terminate()
+
+    async def run(self) -> None:
+        # Imported here as the engines are built lazily, so importing the app does not load the driver
+        import asyncpg
+        delay = 1
+        while True:
+            try:
+                await self._listen()
+                logger.warning("Notification connection lost, reconnecting")
+                delay = 1
+            except (OSError, asyncio.TimeoutError, asyncpg.PostgresError, asyncpg.InterfaceError) as error:
+                logger.error(f"Notification connection failed, retrying in {delay} s: {error}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.RETRY_MAX_SECONDS)
+
+
+def payload_chunks(items: list[str]) -> list[str]:
+    """Comma separated items, split into payloads NOTIFY accepts."""
+    chunks, chunk, size = [], [], 0
+    for item in items:
+        if chunk and size + len(item) + 1 > MAX_PAYLOAD_BYTES:
+            chunks.append(",".join(chunk))
+            chunk, size = [], 0
+        chunk.append(item)
+        size += len(item) + 1
+    if chunk:
+        chunks.append(",".join(chunk))
+    return chunks
+
+
+async def notify(session: AsyncSession, channel: str, items: list[str]) -> None:
+    # Sent in the session's transaction, so listeners get it only once that commits
+    for payload in payload_chunks(items):
+        await session.execute(select(func.pg_notify(channel, payload)))
+
+
+notifications = Notifications(
+    settings.db, application_name=f"{settings.db.APPLICATION_NAME or settings.api.SERVICE_SLUG}-listener",
+)
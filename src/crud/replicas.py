@@ -0,0 +1,95 @@
+import itertools
+import time
+from functools import partial
+
+from loguru import logger
+from sqlalchemy import event
+from sqlalchemy.engine import ExceptionContext
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import Session, ORMExecuteState
+
+from src.core.cache import TTLCache
+from .pool import pool_stats
+
+HAS_WRITES = "has_writes"
+
+
+class ReplicaRouter:
+    """Round-robin choice of a read replica engine.
+
+    A replica that fails with a connection error is ejected for eject_seconds.
+    Callers that wrote within read_your_writes_seconds keep reading from the
+    primary, so they never see a replica that is behind their own write.
+    """
+
+    def __init__(self, primary: AsyncEngine, replicas: list[AsyncEngine],
+                 eject_seconds: float, read_your_writes_seconds: float):
+        self.primary = primary
+        self.replicas = replicas
+        self.eject_seconds = eject_seconds
+        self.selections = [0] * len(replicas)
+        self.primary_selections = 0
+        self._ejected_until = [0.0] * len(replicas)
+        self._round_robin = itertools.count()
+        self._recent_writers: TTLCache[str, bool] | None = None
+        if read_your_writes_seconds > 0:
+            self._recent_writers = TTLCache(max_size=100_000, ttl=read_your_writes_seconds)
+        for index, replica in enumerate(replicas):
+            event.listen(replica.sync_engine, "handle_error", partial(self._on_error, index))
+
+    def _on_error(self, index: int, context: ExceptionContext) -> None:
+        if context.is_disconnect or isinstance(context.original_exception, OSError):
+            self.eject(index)
+
+    def eject(self, index: int) -> None:
+        self._ejected_until[index] = time.monotonic() + self.eject_seconds
+        logger.warning(f"Replica {index} ejected for {self.eject_seconds} seconds")
+
+    def eject_engine(self, replica: AsyncEngine) -> None:
+        for index, candidate in enumerate(self.replicas):
+            if candidate is replica:
+                self.eject(index)
+
+    def mark_write(self, caller: str | None) -> None:
+        if self._recent_writers is not None and caller:
+            self._recent_writers.set(caller, True)
+
+    def choose(self, caller: str | None = None) -> AsyncEngine:
+        if self.replicas and not (
+            self._recent_writers is not None and caller and self._recent_writers.get(caller)
+        ):
+            now = time.monotonic()
+            for _ in range(len(self.replicas)):
+                index = next(self._round_robin) % len(self.replicas)
+                if self._ejected_until[index] <= now:
+                    self.selections[index] += 1
+                    return self.replicas[index]
+        self.primary_selections += 1
+        return self.primary
+
+    def status(self) -> dict:
+        now = time.monotonic()
+        return {
+            "primary_selections": self.primary_selections,
+            "replicas": [
+                {
+                    "url": replica.url.render_as_string(hide_password=True),
+                    "healthy": self._ejected_until[index] <= now,
+                    "ejected_for": max(self._ejected_until[index] - now, 0.0),
+                    "selections": self.selections[index],
+                    "pool": pool_stats(replica),
+                }
+                for index, replica in enumerate(self.replicas)
+            ],
+        }
+
+
+@event.listens_for(Session, "after_flush")
+def _flushed(session: Session, flush_context) -> None:
+    session.info[HAS_WRITES] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _executed(state: ORMExecuteState) -> None:
+    if state.is_insert or state.is_update or state.is_delete:
+        state.session.info[HAS_WRITES] = True
@@ -1,30 +1,237 @@
-from typing import Generic, TypeVar
-from uuid import UUID
+import functools
+import hashlib
+import inspect
+from typing import AsyncIterator, Generic, Hashable, TypeVar, Sequence
+from uuid import UUID, uuid4
 
-from fastapi.encoders import jsonable_encoder
 from loguru import logger
-from sqlalchemy import select, exc, update
+from sqlalchemy import select, exc, update, delete, insert, tuple_, any_, literal, column, values, ARRAY
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.engine import Row
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.sql.elements import ClauseElement
+from sqlalchemy.orm import InstrumentedAttribute
+from sqlalchemy.sql import Select
+from sqlalchemy.sql.elements import ClauseElement, ColumnElement
 
+from .pagination import encode_cursor, decode_cursor
 from ..models.base import BaseORMModel
+from ..replicas import HAS_WRITES
+from ...core.logs import log_query
+from ...core.metrics import DB_QUERIES_SHARED, QUERY_SOURCE_DEFAULT, query_source
+from ...core.result_cache import ResultCache, result_cache
+from ...core.singleflight import SingleFlight, singleflight
+from ..unit_of_work import UNIT_OF_WORK
 from ...exceptions.crud import RepoNotFoundException, RepoConflictException
 
 BaseModel = TypeVar('BaseModel', bound=BaseORMModel)
 
+
+def _labelled(name: str, method):
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        # Queries sent while the method runs are attributed to "<table>.<method>" in the metrics;
+        # the outermost repository method wins over the helpers it calls
+        if query_source.get() != QUERY_SOURCE_DEFAULT:
+            return await method(self, *args, **kwargs)
+        token = query_source.set(f"{self.model.__tablename__}.{name}")
+        try:
+            return await method(self, *args, **kwargs)
+        finally:
+            query_source.reset(token)
+    return wrapper
+
+
+def label_queries(cls: type) -> type:
+    for name, attr in list(vars(cls).items()):
+        if not name.startswith("_") and inspect.iscoroutinefunction(attr):
+            setattr(cls, name, _labelled(name, attr))
+    return cls
+
+
+@label_queries
 class BaseRepository(Generic[BaseModel]):
+    result_cache: ResultCache | None = result_cache
+    singleflight: SingleFlight | None = singleflight
+    # Cached reads are grouped by the owner of the rows, writes drop the owner's group
+    cache_scope_attr = "user_id"
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        label_queries(cls)
+
     def __init__(self, model: type[BaseModel], session: AsyncSession):
         self.model = model
         self.session = session
 
-    async def get_multi_paginated(self, offset: int = 0, limit: int = 0,
-                                  whereclause: ClauseElement | None = None) -> list[BaseModel]:
-        query = select(self.model).offset(offset).limit(limit)
+    def cache_key_of(self, query: Select) -> str:
+        compiled = query.compile(dialect=self.session.bind.dialect)
+        text = f"{compiled}|{sorted(compiled.params.items())!r}"
+        return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+    def flight_key_of(self, query: Select) -> Hashable | None:
+        # SQLAlchemy's statement cache key stands for the compiled SQL without compiling it again;
+        # None for a query with a construct that does not support caching
+        cache_key = query._generate_cache_key()
+        if cache_key is None:
+            return None
+        params = repr([param.effective_value for param in cache_key.bindparams])
+        return self.session.bind, cache_key.key, params
+
+    async def scalars(self, query: Select) -> list[BaseModel]:
+        response = await self.session.execute(query)
+        return response.scalars().all()
+
+    async def scalars_shared(self, query: Select) -> tuple[list[BaseModel], bool]:
+        """Rows of the query, and whether they came from an identical query of another caller."""
+        session = self.session
+        # A transaction that wrote sees rows the others do not
+        if self.singleflight is None or session.info.get(HAS_WRITES) or session.new or session.dirty or session.deleted:
+            return await self.scalars(query), False
+        flight_key = self.flight_key_of(query)
+        if flight_key is None:
+            return await self.scalars(query), False
+        items, shared = await self.singleflight.do(flight_key, functools.partial(self.scalars, query))
+        if not shared:
+            return items, False
+        DB_QUERIES_SHARED.inc(query_source.get())
+        # Instances of the leader's session; callers get copies, like result cache hits
+        return [self.model(**item.as_dict()) for item in items], True
+
+    async def scalars_cached(self, query: Select, cache_scope: Hashable | None = None) -> list[BaseModel]:
+        if self.result_cache is None or cache_scope is None:
+            items, _ = await self.scalars_shared(query)
+            return items
+        namespace = self.model.__tablename__
+        entry_key, rows = await self.result_cache.get(namespace, cache_scope, self.cache_key_of(query))
+        if rows is not None:
+            return [self.model(**row) for row in rows]
+        items, shared = await self.scalars_shared(query)
+        if not shared:
+            await self.result_cache.set(entry_key, [item.as_dict() for item in items])
+        return items
+
+    async def _commit(self) -> None:
+        # In a unit of work the request commits once at the end
+        if UNIT_OF_WORK in self.session.info:
+            await self.session.flush()
+        else:
+            await self.session.commit()
+
+    async def _invalidate_after_commit(self, scopes: Sequence[Hashable | None]) -> None:
+        unit_of_work = self.session.info.get(UNIT_OF_WORK)
+        if unit_of_work is None:
+            await self.invalidate_cache(scopes)
+        else:
+            unit_of_work.after_commit(functools.partial(self.invalidate_cache, scopes))
+
+    async def invalidate_cache(self, scopes: Sequence[Hashable | None] = ()) -> None:
+        if self.result_cache is None:
+            return
+        namespace = self.model.__tablename__
+        scopes = set(scopes)
+        if None in scopes:
+            await self.result_cache.invalidate(namespace)
+            return
+        for scope in scopes:
+            await self.result_cache.invalidate(namespace, scope)
+
+    def cache_scopes_of(self, objs: Sequence[BaseModel]) -> list[Hashable | None]:
+        return [getattr(obj, self.cache_scope_attr, None) for obj in objs]
+
+    @property
+    def keyset_columns(self) -> tuple[InstrumentedAttribute, ...]:
+        created_at = getattr(self.model, "created_at", None)
+        if created_at is not None:
+            return created_at, self.model.id
+        return (self.model.id,)
+
+    def cursor_of(self, obj: BaseModel) -> str:
+        return encode_cursor([getattr(obj, column.key) for column in self.keyset_columns])
+
+    @property
+    def version_columns(self) -> tuple[InstrumentedAttribute, ...]:
+        # Enough to tell whether a row changed without loading its content
+        return tuple(
+            getattr(self.model, key) for key in ("id", "created_at", "updated_at") if hasattr(self.model, key)
+        )
+
+    def page_query(self, *entities, limit: int, offset: int = 0, cursor: str | None = None,
+                   whereclause: ClauseElement | None = None) -> Select:
+        columns = self.keyset_columns
+        query = select(*entities).order_by(*(column.desc() for column in columns)).limit(limit)
+        if offset:
+            query = query.offset(offset)
         if whereclause is not None:
             query = query.where(whereclause)
-        logger.info(f"Query: {str(query)}")
+        if cursor is not None:
+            query = query.where(tuple_(*columns) < decode_cursor(cursor, columns))
+        return query
+
+    async def get_multi_paginated(self, offset: int = 0, limit: int = 0,
+                                  whereclause: ClauseElement | None = None,
+                                  cache_scope: Hashable | None = None) -> list[BaseModel]:
+        query = self.page_query(self.model, limit=limit, offset=offset, whereclause=whereclause)
+        log_query(query)
+        return await self.scalars_cached(query, cache_scope)
+
+    async def get_multi_keyset(self, limit: int, cursor: str | None = None,
+                               whereclause: ClauseElement | None = None,
+                               cache_scope: Hashable | None = None) -> tuple[list[BaseModel], str | None]:
+        query = self.page_query(self.model, limit=limit, cursor=cursor, whereclause=whereclause)
+        log_query(query)
+        items = await self.scalars_cached(query, cache_scope)
+        next_cursor = self.cursor_of(items[-1]) if len(items) == limit else None
+        return items, next_cursor
+
+    async def get_page_versions(self, limit: int, offset: int = 0, cursor: str | None = None,
+                                whereclause: ClauseElement | None = None) -> list[Row]:
+        query = self.page_query(
+            *self.version_columns, limit=limit, offset=offset, cursor=cursor, whereclause=whereclause,
+        )
+        log_query(query)
         response = await self.session.execute(query)
-        return response.scalars().all()
+        return response.all()
+
+    async def get_page_projected(self, projection: Sequence[ColumnElement], limit: int, offset: int = 0,
+                                 cursor: str | None = None,
+                                 whereclause: ClauseElement | None = None) -> tuple[list[Row], str | None]:
+        """Rows of only the given labelled columns, plus the version columns that cursors and ETags need."""
+        keys = {column.key for column in projection}
+        query = self.page_query(
+            *(column for column in self.version_columns if column.key not in keys), *projection,
+            limit=limit, offset=offset, cursor=cursor, whereclause=whereclause,
+        )
+        log_query(query)
+        rows = (await self.session.execute(query)).all()
+        next_cursor = self.cursor_of(rows[-1]) if len(rows) == limit else None
+        return rows, next_cursor
+
+    async def get_version_one_or_none(self, whereclause: ClauseElement) -> Row:
+        query = select(*self.version_columns).where(whereclause)
+        log_query(query)
+        response = await self.session.execute(query)
+        row = response.one_or_none()
+        if row is None:
+            raise RepoNotFoundException("Id not found")
+        return row
+
+    async def stream_keyset(self, cursor: str | None = None, whereclause: ClauseElement | None = None,
+                            batch_size: int = 500) -> AsyncIterator[Sequence[Row]]:
+        # Plain column rows from a server-side cursor, batch_size rows at a time
+        columns = self.keyset_columns
+        query = (
+            select(*(getattr(self.model, attr.key) for attr in self.model.__mapper__.column_attrs))
+            .order_by(*(column.desc() for column in columns))
+            .execution_options(yield_per=batch_size)
+        )
+        if whereclause is not None:
+            query = query.where(whereclause)
+        if cursor is not None:
+            query = query.where(tuple_(*columns) < decode_cursor(cursor, columns))
+        log_query(query)
+        response = await self.session.stream(query)
+        async for partition in response.partitions():
+            yield partition
 
     async def get_by_id(self, id: UUID,
                         whereclause: ClauseElement | None = None) -> BaseModel | None:
@@ -41,32 +248,55 @@ class BaseRepository(Generic[BaseModel]):
         query = select(self.model)
         if whereclause is not None:
             query = query.where(whereclause)
-        logger.info(f"Query: {str(query)}")
+        log_query(query)
         response = await self.session.execute(query)
         return response.scalars().all()
 
-    async def get_by_where_one_or_none(self, whereclause: ClauseElement) -> BaseModel | None:
+    async def get_many_by_ids(self, ids: Sequence[UUID], whereclause: ClauseElement | None = None,
+                              cache_scope: Hashable | None = None) -> list[BaseModel]:
+        """Rows of the given ids that match whereclause, in no particular order; missing ids are left out."""
+        if not ids:
+            return []
+        query = select(self.model).where(self.id_in(list(dict.fromkeys(ids))))
+        if whereclause is not None:
+            query = query.where(whereclause)
+        log_query(query)
+        return await self.scalars_cached(query, cache_scope)
+
+    async def get_by_where_one_or_none(self, whereclause: ClauseElement,
+                                       cache_scope: Hashable | None = None) -> BaseModel | None:
         query = select(self.model)
         if whereclause is not None:
             query = query.where(whereclause)
-        logger.info(f"Query: {str(query)}")
-        response = await self.session.execute(query)
-        obj = response.scalars().one_or_none()
-        if not obj:
+        log_query(query)
+        objs = await self.scalars_cached(query, cache_scope)
+        if len(objs) > 1:
+            raise exc.MultipleResultsFound("Multiple rows were found when one or none was required")
+        if not objs:
             raise RepoNotFoundException("Id not found")
-        return obj
+        return objs[0]
 
-    async def delete(self, id: UUID, whereclause: ClauseElement | None = None) -> None:
-        obj = await self.get_by_id(id=id, whereclause=whereclause)
-        if not obj:
+    async def delete(self, id: UUID, whereclause: ClauseElement | None = None) -> BaseModel:
+        query = delete(self.model).where(self.model.id == id).returning(self.model)
+        if whereclause is not None:
+            query = query.where(whereclause)
+        try:
+            response = await self.session.execute(query)
+        except exc.IntegrityError as e:
+            logger.error(e)
+            await self.session.rollback()
+            raise RepoConflictException("Resource is still referenced")
+        obj = response.scalar_one_or_none()
+        if obj is None:
             raise RepoNotFoundException("Id not found")
-        await self.session.delete(obj)
-        await self.session.commit()
+        await self._commit()
+        await self._invalidate_after_commit(self.cache_scopes_of([obj]))
+        return obj
 
     async def create(self, obj_in: BaseModel) -> BaseModel | None:
         try:
             self.session.add(obj_in)
-            await self.session.commit()
+            await self._commit()
             await self.session.refresh(obj_in)
         except exc.IntegrityError as e:
             logger.error(e)
@@ -75,29 +305,166 @@ class BaseRepository(Generic[BaseModel]):
         except exc.SQLAlchemyError as e:
             await self.session.rollback()
             raise e
+        await self._invalidate_after_commit(self.cache_scopes_of([obj_in]))
         return obj_in
 
     async def create_all(self, objs_in: list[BaseModel]) -> list[BaseModel] | None:
         try:
             self.session.add_all(objs_in)
-            await self.session.commit()
+            await self._commit()
         except exc.IntegrityError:
             await self.session.rollback()
             raise RepoConflictException("Resource already exists")
         except exc.SQLAlchemyError as e:
             await self.session.rollback()
             raise e
+        await self._invalidate_after_commit(self.cache_scopes_of(objs_in))
         return objs_in
 
-    async def update(self, id: UUID, obj_in: BaseModel,
-                     whereclause: ClauseElement | None = None) -> BaseModel | None:
-        query = update(self.model).where(self.model.id == id).values(jsonable_encoder(obj_in))
-        obj = await self.get_by_id(id=id, whereclause=whereclause)
-        if not obj:
-            raise RepoNotFoundException("Object not found")
+    def values_of(self, obj_in: BaseModel | dict) -> dict:
+        if isinstance(obj_in, dict):
+            return obj_in
+        # Only the attributes that were actually set on the instance
+        return {
+            attr.key: obj_in.__dict__[attr.key]
+            for attr in self.model.__mapper__.column_attrs
+            if attr.key in obj_in.__dict__ and attr.key != "id"
+        }
 
-        await self.session.execute(query)
-        await self.session.commit()
-        await self.session.commit()
-        await self.session.refresh(obj)
+    async def update(self, id: UUID, obj_in: BaseModel | dict,
+                     whereclause: ClauseElement | None = None) -> BaseModel:
+        query = (
+            update(self.model)
+            .where(self.model.id == id)
+            .values(self.values_of(obj_in))
+            .returning(self.model)
+            .execution_options(synchronize_session=False, populate_existing=True)
+        )
+        if whereclause is not None:
+            query = query.where(whereclause)
+        try:
+            response = await self.session.execute(query)
+        except exc.IntegrityError as e:
+            logger.error(e)
+            await self.session.rollback()
+            raise RepoConflictException("Resource already exists")
+        obj = response.scalar_one_or_none()
+        if obj is None:
+            raise RepoNotFoundException("Object not found")
+        await self._commit()
+        await self._invalidate_after_commit(self.cache_scopes_of([obj]))
         return obj
+
+    def id_in(self, ids: Sequence[UUID]) -> ClauseElement:
+        # One "= ANY($1::UUID[])" statement for any number of ids
+        return self.model.id == any_(literal(list(ids), ARRAY(self.model.id.type)))
+
+    async def create_many(self, rows: list[dict], on_conflict_do_nothing: bool = False,
+                          errors: dict[UUID, exc.DBAPIError] | None = None) -> list[BaseModel]:
+        """One INSERT ... RETURNING for all rows.
+
+        Without errors any failure fails the whole call. With errors the insert runs in a savepoint
+        and, if it fails, the rows are retried one by one, each in its own savepoint: rows that fail
+        again are left out of the result and their errors are stored in errors by id.
+        """
+        if not rows:
+            return []
+        # Ids are assigned up front so callers can match returned rows to their input;
+        # rows skipped by ON CONFLICT DO NOTHING are just missing from the result
+        rows = [{"id": uuid4(), **row} for row in rows]
+        query = pg_insert(self.model) if on_conflict_do_nothing else insert(self.model)
+        if on_conflict_do_nothing:
+            query = query.on_conflict_do_nothing()
+        query = query.returning(self.model)
+        if errors is None:
+            try:
+                response = await self.session.scalars(query, rows)
+                created = response.all()
+            except exc.IntegrityError as e:
+                logger.error(e)
+                await self.session.rollback()
+                raise RepoConflictException("Resource already exists")
+        else:
+            created = await self._create_each(query, rows, errors)
+        await self._commit()
+        await self._invalidate_after_commit(self.cache_scopes_of(created))
+        return created
+
+    async def _create_each(self, query, rows: list[dict], errors: dict[UUID, exc.DBAPIError]) -> list[BaseModel]:
+        try:
+            return await self._insert_in_savepoint(query, rows)
+        except exc.DBAPIError as error:
+            if len(rows) == 1:
+                logger.error(f"Insert into {self.model.__tablename__} failed: {error.orig!r}")
+                errors[rows[0]["id"]] = error
+                return []
+            # Any row fails the whole statement (a duplicate, a value too long, a deadlock)
+            logger.warning(f"Insert of {len(rows)} {self.model.__tablename__} rows failed, retrying them one by one")
+        created = []
+        for row in rows:
+            try:
+                created.extend(await self._insert_in_savepoint(query, [row]))
+            except exc.DBAPIError as error:
+                logger.error(f"Insert into {self.model.__tablename__} failed: {error.orig!r}")
+                errors[row["id"]] = error
+        return created
+
+    async def _insert_in_savepoint(self, query, rows: list[dict]) -> list[BaseModel]:
+        # A failing statement only rolls back to the savepoint, not the request's transaction
+        async with self.session.begin_nested():
+            response = await self.session.scalars(query, rows)
+            return response.all()
+
+    async def update_many(self, rows: list[dict],
+                          whereclause: ClauseElement | None = None) -> list[BaseModel]:
+        if not rows:
+            return []
+        # Single UPDATE ... FROM (VALUES ...) RETURNING; every row sets the same columns
+        # and rows that do not exist or fail the whereclause are missing from the result
+        table = self.model.__table__
+        keys = [key for key in rows[0] if key != "id"]
+        data = values(
+            column("id", table.c.id.type),
+            *(column(key, table.c[key].type) for key in keys),
+            name="data",
+        ).data([(row["id"], *(row[key] for key in keys)) for row in rows])
+        query = (
+            update(self.model)
+            .where(self.model.id == data.c.id)
+            .values({key: data.c[key] for key in keys})
+            .returning(self.model)
+            .execution_options(synchronize_session=False, populate_existing=True)
+        )
+        if whereclause is not None:
+            query = query.where(whereclause)
+        try:
+            response = await self.session.scalars(query)
+            updated = response.all()
+        except exc.IntegrityError as e:
+            logger.error(e)
+            await self.session.rollback()
+            raise RepoConflictException("Resource already exists")
+        await self._commit()
+        await self._invalidate_after_commit(self.cache_scopes_of(updated))
+        return updated
+
+    async def delete_many(self, ids: Sequence[UUID],
+                          whereclause: ClauseElement | None = None) -> list[UUID]:
+        if not ids:
+            return []
+        scope_column = getattr(self.model, self.cache_scope_attr, self.model.id)
+        query = delete(self.model).where(self.id_in(ids)).returning(self.model.id, scope_column)
+        if whereclause is not None:
+            query = query.where(whereclause)
+        try:
+            response = await self.session.execute(query)
+            deleted = response.all()
+        except exc.IntegrityError as e:
+            logger.error(e)
+            await self.session.rollback()
+            raise RepoConflictException("Resource is still referenced")
+        await self._commit()
+        has_scope = hasattr(self.model, self.cache_scope_attr)
+        await self._invalidate_after_commit([scope if has_scope else None for _, scope in deleted])
+        return [id for id, _ in deleted]
+
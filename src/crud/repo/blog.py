@@ -0,0 +1,64 @@
+import re
+from typing import Generic, Sequence, TypeVar
+
+from sqlalchemy import Float, func, literal_column, select, tuple_
+from sqlalchemy.engine import Row
+from sqlalchemy.sql.elements import ClauseElement, ColumnElement
+
+from src.core.logs import log_query
+from src.crud.models import BlogModel
+from src.crud.models.blog import SEARCH_CONFIG
+from src.crud.repo.base import BaseRepository
+from src.crud.repo.pagination import encode_cursor, decode_cursor
+from src.schemas.blog import SearchModeEnum
+
+T = TypeVar('T', bound=BlogModel)
+
+
+class BlogRepository(BaseRepository, Generic[T]):
+    search_config = literal_column(f"'{SEARCH_CONFIG}'::regconfig")
+
+    def _tsquery(self, text: str, mode: SearchModeEnum) -> ColumnElement | None:
+        if mode == SearchModeEnum.phrase:
+            return func.phraseto_tsquery(self.search_config, text)
+        if mode == SearchModeEnum.prefix:
+            words = re.findall(r"\w+", text)
+            if not words:
+                return None
+            return func.to_tsquery(self.search_config, " & ".join(f"{word}:*" for word in words))
+        return func.plainto_tsquery(self.search_config, text)
+
+    async def search(self, text: str, mode: SearchModeEnum, limit: int, offset: int = 0,
+                     cursor: str | None = None,
+                     whereclause: ClauseElement | None = None,
+                     projection: Sequence[ColumnElement] | None = None) -> tuple[list[T] | list[Row], str | None]:
+        """Matches best first; with projection, rows of only those labelled columns (and id) instead of instances."""
+        tsquery = self._tsquery(text, mode)
+        if tsquery is None:
+            return [], None
+        search_vector = self.model.__table__.c.search_vector
+        rank = func.ts_rank_cd(search_vector, tsquery, type_=Float)
+        columns = (rank, self.model.id)
+        if projection is None:
+            entities = (self.model,)
+        else:
+            entities = (*projection, *((self.model.id,) if "id" not in {column.key for column in projection} else ()))
+        query = (
+            select(*entities, rank.label("rank"))
+            .where(search_vector.op("@@")(tsquery))
+            .order_by(rank.desc(), self.model.id.desc())
+            .offset(offset)
+            .limit(limit)
+        )
+        if whereclause is not None:
+            query = query.where(whereclause)
+        if cursor is not None:
+            query = query.where(tuple_(*columns) < decode_cursor(cursor, columns))
+        log_query(query)
+        response = await self.session.execute(query)
+        rows = response.all()
+        if projection is not None:
+            next_cursor = encode_cursor([rows[-1].rank, rows[-1].id]) if len(rows) == limit else None
+            return rows, next_cursor
+        next_cursor = encode_cursor([rows[-1].rank, rows[-1][0].id]) if len(rows) == limit else None
+        return [row[0] for row in rows], next_cursor
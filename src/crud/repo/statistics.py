@@ -3,26 +3,42 @@ from typing import Generic, TypeVar
 
 from sqlalchemy import select, func
 
-from src.crud.models import BlogModel
+from src.crud.models import BlogModel, UserBlogStatsModel
 from src.crud.repo.base import BaseRepository
 
 
 T = TypeVar('T', bound=BlogModel)
 
+PERCENTILES = (0.5, 0.9, 0.99)
+
+
 class StatisticsRepository(BaseRepository, Generic[T]):
 
     async def get_average_blog_count_per_user(self, user_id: uuid.UUID) -> float:
-        user_blog_counts = (
-            select(BlogModel.user_id, func.count(BlogModel.id).label("blog_count"))
-            .group_by(BlogModel.user_id)
-            .subquery()
-        )
-        stmt = (
-            select(func.avg(user_blog_counts.c.blog_count))
-            .select_from(user_blog_counts)
-            .where(user_blog_counts.c.user_id == user_id)  # Фильтр по user_id
-        )
+        # Counters live in user_blog_stats, so this is a primary key lookup
+        stmt = select(UserBlogStatsModel.blog_count).where(UserBlogStatsModel.user_id == user_id)
         result = await self.session.execute(stmt)
-        average_blog_count = result.scalar()
+        blog_count = result.scalar()
 
-        return float(average_blog_count) if average_blog_count is not None else 0.0
+        return float(blog_count) if blog_count is not None else 0.0
+
+    async def get_global_statistics(self) -> dict[str, float | int]:
+        # Aggregates over one counter row per user, the blog table is not touched
+        blog_count = UserBlogStatsModel.blog_count
+        stmt = select(
+            func.count().label("total_users"),
+            func.coalesce(func.sum(blog_count), 0).label("total_posts"),
+            func.coalesce(func.avg(blog_count), 0).label("average"),
+            *(
+                func.coalesce(func.percentile_cont(percentile).within_group(blog_count), 0)
+                .label(f"p{round(percentile * 100)}")
+                for percentile in PERCENTILES
+            ),
+        )
+        result = await self.session.execute(stmt)
+        row = result.one()._asdict()
+        return {
+            "total_users": int(row.pop("total_users")),
+            "total_posts": int(row.pop("total_posts")),
+            **{key: float(value) for key, value in row.items()},
+        }
@@ -0,0 +1,80 @@
+from typing import Awaitable, Callable
+
+from loguru import logger
+from sqlalchemy import exc
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.crud import database
+from .replicas import HAS_WRITES
+
+# Session.info key of the unit of work a session belongs to
+UNIT_OF_WORK = "unit_of_work"
+
+
+async def connect_read_session(caller: str | None, primary_session: AsyncSession | None = None) -> AsyncSession:
+    replica_router = database.replica_router
+    while True:
+        read_engine = replica_router.choose(caller)
+        if read_engine is replica_router.primary:
+            return primary_session if primary_session is not None else database.async_session_factory()
+        session = database.async_session_factory(bind=read_engine)
+        try:
+            # Connect eagerly so a dead replica is skipped instead of failing the request
+            await session.connection()
+            return session
+        except (exc.DBAPIError, OSError) as error:
+            logger.error(error)
+            await session.close()
+            replica_router.eject_engine(read_engine)
+
+
+class UnitOfWork:
+    """Sessions shared by every repository of one request.
+
+    The primary session checks out a connection on its first query. Repositories flush
+    instead of committing when their session belongs to a unit of work, so the request
+    commits or rolls back once, and cache invalidations wait for that commit.
+    """
+
+    def __init__(self, caller: str | None = None):
+        self.caller = caller
+        self._session: AsyncSession | None = None
+        self._read_session: AsyncSession | None = None
+        self._after_commit: list[Callable[[], Awaitable[None]]] = []
+
+    @property
+    def session(self) -> AsyncSession:
+        if self._session is None:
+            self._session = database.async_session_factory(info={UNIT_OF_WORK: self})
+        return self._session
+
+    async def read_session(self) -> AsyncSession:
+        # Reads routed to the primary reuse the request's session and its connection
+        if self._read_session is None:
+            self._read_session = await connect_read_session(self.caller, primary_session=self.session)
+        return self._read_session
+
+    @property
+    def has_writes(self) -> bool:
+        return self._session is not None and bool(self._session.info.get(HAS_WRITES))
+
+    def after_commit(self, callback: Callable[[], Awaitable[None]]) -> None:
+        self._after_commit.append(callback)
+
+    async def commit(self) -> None:
+        if self._session is not None:
+            await self._session.commit()
+        callbacks, self._after_commit = self._after_commit, []
+        for callback in callbacks:
+            await callback()
+
+    async def rollback(self) -> None:
+        self._after_commit.clear()
+        if self._session is not None:
+            await self._session.rollback()
+
+    async def close(self) -> None:
+        if self._read_session is not None and self._read_session is not self._session:
+            await self._read_session.close()
+        if self._session is not None:
+            await self._session.close()
@@ -0,0 +1,83 @@
+import asyncio
+import uuid
+
+from loguru import logger
+from sqlalchemy import and_, exc
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession
+
+from src.core.metrics import query_source
+from src.core.settings import settings
+from src.crud import database
+from src.crud.models import BlogModel, UserModel
+from src.crud.repo.base import BaseRepository
+from src.exceptions.crud import RepoNotFoundException
+
+NIL = uuid.UUID(int=0)
+
+
+async def _run_hot_statements(connection: AsyncConnection) -> None:
+    # Same statements as the auth lookup, GET /posts and GET /posts/list, so that they are
+    # compiled and prepared on this connection before the first request needs them
+    session = AsyncSession(bind=connection)
+    users = BaseRepository(UserModel, session)
+    blogs = BaseRepository(BlogModel, session)
+    lookups = (
+        (users, UserModel.token_digest == "0" * 64),
+        (blogs, and_(BlogModel.id == NIL, BlogModel.user_id == NIL)),
+    )
+    for repo, whereclause in lookups:
+        try:
+            await repo.get_by_where_one_or_none(whereclause)
+        except RepoNotFoundException:
+            pass
+    await blogs.get_multi_keyset(10, whereclause=BlogModel.user_id == NIL)
+    await session.close()
+
+
+async def _warm_up_engine(engine: AsyncEngine, connections: int) -> None:
+    # Connections are held until all of them are open, otherwise the pool hands out the same one
+    if connections < 1:
+        return
+    barrier = asyncio.Barrier(connections)
+
+    async def one() -> None:
+        try:
+            async with engine.connect() as connection:
+                await _run_hot_statements(connection)
+                await barrier.wait()
+        except BaseException:
+            await barrier.abort()
+            raise
+
+    await asyncio.gather(*(one() for _ in range(connections)))
+
+
+async def warm_up(connections: int | None = None) -> None:
+    """Opens pool connections to the primary and every replica and prepares the hot statements.
+
+    Fails only if the primary cannot be warmed up; a failing replica is ejected instead.
+    """
+    pool_size, max_overflow = settings.db.pool_limits(settings.run.WORKERS or 1)
+    if connections is None:
+        connections = pool_size
+    elif max_overflow >= 0 and connections > pool_size + max_overflow:
+        # All of them are held at once, more than the pool gives out would wait for the pool timeout
+        logger.warning(f"Warming up {pool_size + max_overflow} connections per engine, the pool capacity "
+                       f"of this worker, instead of {connections}")
+        connections = pool_size + max_overflow
+    token = query_source.set("warmup")
+    try:
+        engines = [database.engine, *database.replica_engines]
+        results = await asyncio.gather(*(_warm_up_engine(engine, connections) for engine in engines),
+                                       return_exceptions=True)
+    finally:
+        query_source.reset(token)
+    primary_error, *replica_errors = results
+    for engine, error in zip(database.replica_engines, replica_errors):
+        if isinstance(error, (exc.DBAPIError, OSError)):
+            logger.error(f"Warm-up of replica {engine.url!r} failed: {error}")
+            database.replica_router.eject_engine(engine)
+        elif isinstance(error, BaseException):
+            raise error
+    if isinstance(primary_error, BaseException):
+        raise primary_error
@@ -12,4 +12,8 @@ class RepoConflictException(APIBaseException):
 
 class AlreadyExistsException(APIBaseException):
     def __init__(self, detail: str, status_code: int = 409):
-        super().__init__(status_code=status_code, detail=detail)
\ No newline at end of file
+        super().__init__(status_code=status_code, detail=detail)
+
+class InvalidCursorException(APIBaseException):
+    def __init__(self, detail: str, status_code: int = 400):
+        super().__init__(status_code=status_code, detail=detail)
@@ -1,25 +1,45 @@
-from dataclasses import Field
 from datetime import datetime
 import uuid
 from decimal import Decimal
+from enum import Enum
 
-from pydantic import BaseModel, model_validator
+from pydantic import BaseModel, Field, model_validator
+
+
+class SearchModeEnum(str, Enum):
+    all_words = "all_words"
+    phrase = "phrase"
+    prefix = "prefix"
+
+
+# blog.title is String(255); longer titles are rejected here instead of failing the INSERT
+TITLE_MAX_LENGTH = 255
 
 
 class BlogInput(BaseModel):
-    title: str
+    title: str = Field(max_length=TITLE_MAX_LENGTH)
     content: str
 
-class BlogSearchInput(BlogInput):
+class BlogBulkUpdateInput(BlogInput):
+    id: uuid.UUID
+
+
+class BlogSearchInput(BaseModel):
+    query: str | None = None
+    mode: SearchModeEnum = SearchModeEnum.all_words
     title: str | None = None
     content: str | None = None
 
     @model_validator(mode='before')
     def check_at_least_one_field(cls, values):
-        if not any(values.get(field) for field in ('title', 'content')):
-            raise ValueError('Хотя бы одно из полей "title" или "content" должно быть заполнено.')
+        if not any(values.get(field) for field in ('query', 'title', 'content')):
+            raise ValueError('Хотя бы одно из полей "query", "title" или "content" должно быть заполнено.')
         return values
 
+    @property
+    def search_text(self) -> str:
+        return " ".join(value for value in (self.query, self.title, self.content) if value)
+
 
 class BlogOutput(BlogInput):
     created_at: datetime
@@ -27,12 +47,34 @@ class BlogOutput(BlogInput):
     id: uuid.UUID
 
 
-class StatisticsBlogOutput(BaseModel):
-    average: float
-
+class BlogSummaryOutput(BaseModel):
+    id: uuid.UUID
+    title: str
+    created_at: datetime
+    updated_at: datetime | None
+    # Size of the content in bytes (UTF-8)
+    content_length: int
 
 
+class BlogFieldsOutput(BaseModel):
+    """Any subset of these, as chosen with fields=."""
+    id: uuid.UUID | None = None
+    title: str | None = None
+    content: str | None = None
+    created_at: datetime | None = None
+    updated_at: datetime | None = None
+    content_length: int | None = None
+    snippet: str | None = None
 
 
+class StatisticsBlogOutput(BaseModel):
+    average: float
 
 
+class StatisticsGlobalBlogOutput(BaseModel):
+    total_users: int
+    total_posts: int
+    average: float
+    p50: float
+    p90: float
+    p99: float
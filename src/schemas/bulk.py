@@ -0,0 +1,25 @@
+import uuid
+from enum import Enum
+from typing import Generic, TypeVar
+
+from pydantic import BaseModel
+
+T = TypeVar('T')
+
+
+class BulkStatusEnum(str, Enum):
+    created = "created"
+    updated = "updated"
+    deleted = "deleted"
+    found = "found"
+    not_found = "not_found"
+    conflict = "conflict"
+    # The row could not be written for another reason, e.g. a deadlock
+    failed = "failed"
+
+
+class BulkItemResult(BaseModel, Generic[T]):
+    index: int
+    id: uuid.UUID
+    status: BulkStatusEnum
+    data: T | None = None
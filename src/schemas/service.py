@@ -0,0 +1,47 @@
+from pydantic import BaseModel
+
+
+class CacheStatsOutput(BaseModel):
+    size: int
+    max_size: int
+    ttl: float
+    hits: int
+    misses: int
+    evictions: int
+    hit_ratio: float
+
+
+class PoolStatsOutput(BaseModel):
+    size: int
+    checked_in: int
+    checked_out: int
+    overflow: int
+    wait_count: int = 0
+    wait_time_total: float = 0.0
+    wait_time_max: float = 0.0
+    timeouts: int = 0
+
+
+class ReplicaStatusOutput(BaseModel):
+    url: str
+    healthy: bool
+    ejected_for: float
+    selections: int
+    pool: PoolStatsOutput
+
+
+class ReplicaRoutingOutput(BaseModel):
+    primary_selections: int
+    replicas: list[ReplicaStatusOutput]
+
+
+class ResultCacheStatsOutput(BaseModel):
+    backend: str
+    ttl: float
+    hits: int
+    misses: int
+    hit_ratio: float
+    invalidations: int
+    errors: int
+    size: int
+    memory_bytes: int
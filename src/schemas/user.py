@@ -1,15 +1,32 @@
 import uuid
+from typing import Annotated
 
-from pydantic import BaseModel, field_validator, Field
+from pydantic import AfterValidator, BaseModel, ConfigDict, field_validator, Field
 
-from src.core.secure import decrypt_token
+from src.core.secure import decrypt_token, encrypt_token
+
+# user.name and user.token are String(255)
+COLUMN_MAX_LENGTH = 255
+
+
+def fits_token_column(token: str) -> str:
+    # Stored encrypted, which is longer than the token itself
+    if len(encrypt_token(token)) > COLUMN_MAX_LENGTH:
+        raise ValueError(f"Token too long, encrypted it has to fit in {COLUMN_MAX_LENGTH} characters")
+    return token
 
 
 class UserInput(BaseModel):
-    name: str = Field(description="Foo name", default="Bar name")
-    token: str = Field(description="FooBarToken")
+    name: str = Field(description="Foo name", default="Bar name", max_length=COLUMN_MAX_LENGTH)
+    token: Annotated[str, AfterValidator(fits_token_column)] = Field(description="FooBarToken")
+
+class UserBulkUpdateInput(UserInput):
+    id: uuid.UUID
+
 
 class UserOutput(UserInput):
+    # Read encrypted from the database, so without the input length check
+    token: str = Field(description="FooBarToken")
     id: uuid.UUID
 
     @field_validator("token")
@@ -17,8 +34,8 @@ class UserOutput(UserInput):
         return decrypt_token(token)
 
 
+class UserPrincipal(BaseModel):
+    model_config = ConfigDict(frozen=True)
 
-
-
-
-
+    id: uuid.UUID
+    name: str
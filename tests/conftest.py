@@ -0,0 +1,28 @@
+import atexit
+import os
+
+import pytest
+
+# Every statement of the suite is EXPLAINed; sequential scans are logged as warnings and
+# listed in the summary. Read when the settings are imported, so it has to come first
+os.environ.setdefault("DB__INDEX_ADVISOR", "true")
+
+
+@pytest.fixture
+def anyio_backend() -> str:
+    return "asyncio"
+
+
+def pytest_terminal_summary(terminalreporter) -> None:
+    from src.crud import database
+
+    advisor = database.index_advisor
+    if advisor is None:
+        return
+    # Reported here instead: at exit the log stream captured by pytest is already closed
+    atexit.unregister(advisor.report)
+    terminalreporter.section("index advisor")
+    if not advisor.findings:
+        terminalreporter.line("no sequential scans found")
+    for (table, statement), count in advisor.findings.items():
+        terminalreporter.line(f"seq scan on {table} ({count} times): {' '.join(statement.split())}")
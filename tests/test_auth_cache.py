@@ -0,0 +1,46 @@
+import uuid
+
+import pytest
+
+from src.api.depends import auth_cache, invalidate_client_auth
+from src.crud import database
+from src.crud.models.user import UserModel
+from src.crud.repo.base import BaseRepository
+from src.crud.unit_of_work import UnitOfWork
+from src.schemas.user import UserPrincipal
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def cached_principal():
+    principal = UserPrincipal(id=uuid.uuid4(), name="test-auth-cache")
+    digest = f"test-digest-{principal.id}"
+    auth_cache.set(digest, principal)
+    yield digest, principal
+    auth_cache.invalidate(digest)
+    await database.engine.dispose()
+
+
+async def test_dropped_after_commit(cached_principal):
+    digest, principal = cached_principal
+    unit_of_work = UnitOfWork(None)
+    try:
+        await invalidate_client_auth(BaseRepository(UserModel, unit_of_work.session), [principal.id])
+        # A concurrent request would still find the old client in the database and cache it again
+        assert auth_cache.get(digest) == principal
+        await unit_of_work.commit()
+        assert auth_cache.get(digest) is None
+    finally:
+        await unit_of_work.close()
+
+
+async def test_kept_on_rollback(cached_principal):
+    digest, principal = cached_principal
+    unit_of_work = UnitOfWork(None)
+    try:
+        await invalidate_client_auth(BaseRepository(UserModel, unit_of_work.session), [principal.id])
+        await unit_of_work.rollback()
+        assert auth_cache.get(digest) == principal
+    finally:
+        await unit_of_work.close()
@@ -0,0 +1,86 @@
+import uuid
+
+import httpx
+import pytest
+from sqlalchemy import delete
+
+from benchmarks.common import create_api_user, drop_bench_user
+from main import create_app
+from src.api.bulk import bulk_results
+from src.core import settings
+from src.crud import database
+from src.crud.models import BlogModel, UserModel
+from src.crud.repo.base import BaseRepository
+from src.schemas.bulk import BulkStatusEnum
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def client():
+    transport = httpx.ASGITransport(app=create_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+    await database.engine.dispose()
+
+
+@pytest.fixture
+async def api_user():
+    async with database.async_session_factory() as session:
+        user, headers = await create_api_user(session)
+    yield user, headers
+    async with database.async_session_factory() as session:
+        await drop_bench_user(session, user.id)
+
+
+async def test_too_long_title_rejected_up_front(client, api_user):
+    _, headers = api_user
+    payload = [{"title": "ok", "content": "c"}, {"title": "x" * 256, "content": "c"}]
+    response = await client.post("/api/v1/posts/bulk", json=payload, headers=headers)
+    assert response.status_code == 422
+
+
+async def test_failing_rows_reported_per_item(client, api_user):
+    user, headers = api_user
+    rows = [{"id": uuid.uuid4(), **row} for row in (
+        {"title": "first", "content": "c", "user_id": user.id},
+        # Past the schema, the INSERT itself fails on these
+        {"title": "x" * 256, "content": "c", "user_id": user.id},
+        {"title": "no such user", "content": "c", "user_id": uuid.uuid4()},
+        {"title": "last", "content": "c", "user_id": user.id},
+    )]
+    errors = {}
+    async with database.async_session_factory() as session:
+        created = await BaseRepository(BlogModel, session).create_many(rows, errors=errors)
+    assert [blog.title for blog in created] == ["first", "last"]
+    results = bulk_results([row["id"] for row in rows], {blog.id: blog for blog in created},
+                           BulkStatusEnum.created, BulkStatusEnum.failed, errors)
+    assert [result["status"] for result in results] == ["created", "failed", "conflict", "created"]
+
+    response = await client.get("/api/v1/posts/list", headers=headers)
+    assert sorted(blog["title"] for blog in response.json()) == ["first", "last"]
+
+
+async def test_duplicate_client_tokens_are_conflicts(client):
+    token = f"test-bulk-{uuid.uuid4()}"
+    payload = [{"name": "a", "token": token}, {"name": "b", "token": token}, {"name": "c", "token": "x" * 119}]
+    master = {"API": settings.api.MASTER_KEY}
+    response = await client.post("/api/v1/clients/bulk", json=payload, headers=master)
+    assert response.status_code == 422
+
+    response = await client.post("/api/v1/clients/bulk", json=payload[:2], headers=master)
+    try:
+        assert response.status_code == 200
+        assert [item["status"] for item in response.json()] == ["created", "conflict"]
+    finally:
+        async with database.async_session_factory() as session:
+            await session.execute(delete(UserModel).where(UserModel.id.in_([item["id"] for item in response.json()])))
+            await session.commit()
+
+
+async def test_bulk_and_single_create_agree_on_updated_at(client, api_user):
+    _, headers = api_user
+    single = await client.post("/api/v1/posts/", json={"title": "single", "content": "c"}, headers=headers)
+    bulk = await client.post("/api/v1/posts/bulk", json=[{"title": "bulk", "content": "c"}], headers=headers)
+    assert single.json()["updated_at"] is None
+    assert bulk.json()[0]["data"]["updated_at"] is None
@@ -0,0 +1,34 @@
+import asyncio
+
+import pytest
+from sqlalchemy.exc import DBAPIError
+
+from benchmarks.common import create_bench_user, drop_bench_user
+from src.crud import database
+from src.crud.coalescer import InsertCoalescer
+from src.crud.models import BlogModel
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def user():
+    async with database.async_session_factory() as session:
+        user = await create_bench_user(session)
+    yield user
+    async with database.async_session_factory() as session:
+        await drop_bench_user(session, user.id)
+    await database.engine.dispose()
+
+
+async def test_bad_row_fails_only_its_caller(user):
+    coalescer = InsertCoalescer(BlogModel, max_batch_size=3, max_wait=1)
+    # The title does not fit String(255), so the batch INSERT fails with a DataError
+    titles = ["first", "x" * 300, "third"]
+    results = await asyncio.gather(
+        *(coalescer.insert({"title": title, "content": "c", "user_id": user.id}) for title in titles),
+        return_exceptions=True,
+    )
+    assert [result.title for result in (results[0], results[2])] == ["first", "third"]
+    assert isinstance(results[1], DBAPIError)
+    assert coalescer.batches == 2
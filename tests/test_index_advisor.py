@@ -0,0 +1,54 @@
+import uuid
+
+import pytest
+from loguru import logger
+from sqlalchemy import select
+
+from src.crud import database
+from src.crud.models import BlogModel
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def advisor(monkeypatch):
+    advisor = database.index_advisor
+    if advisor is None:
+        pytest.skip("DB__INDEX_ADVISOR=false")
+    # A statement is only reported the first time it is seen
+    monkeypatch.setattr(advisor, "findings", {})
+    yield advisor
+    await database.engine.dispose()
+
+
+@pytest.fixture
+def warnings():
+    messages = []
+    handler = logger.add(lambda message: messages.append(message.record["message"]), level="WARNING")
+    yield messages
+    logger.remove(handler)
+
+
+async def unindexed_read() -> None:
+    # No index covers the content column
+    async with database.async_session_factory() as session:
+        await session.execute(select(BlogModel.id).where(BlogModel.content == "index advisor"))
+
+
+async def test_seq_scan_flagged(advisor, warnings):
+    await unindexed_read()
+    assert [key for key in advisor.findings if key[0] == "blog"]
+    assert any(message.startswith("Sequential scan on table blog") for message in warnings)
+
+
+async def test_small_tables_below_min_rows_not_flagged(advisor, warnings, monkeypatch):
+    monkeypatch.setattr(advisor, "min_rows", 10 ** 12)
+    await unindexed_read()
+    assert not advisor.findings
+    assert not any(message.startswith("Sequential scan") for message in warnings)
+
+
+async def test_indexed_read_not_flagged(advisor, warnings):
+    async with database.async_session_factory() as session:
+        await session.execute(select(BlogModel.id).where(BlogModel.id == uuid.UUID(int=0)))
+    assert not advisor.findings
@@ -0,0 +1,37 @@
+import httpx
+import pytest
+
+from main import create_app
+from src.core import settings
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def client():
+    # No lifespan: the scrape needs no database
+    transport = httpx.ASGITransport(app=create_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+
+async def test_metrics_need_the_master_key(client):
+    assert (await client.get("/metrics")).status_code == 429
+    assert (await client.get("/metrics", headers={"API": "not-the-master-key"})).status_code == 429
+
+
+async def test_scrape(client):
+    await client.get("/health/live")
+    await client.get("/nowhere")
+
+    response = await client.get("/metrics", headers={"API": settings.api.MASTER_KEY})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    lines = response.text.splitlines()
+    assert "# TYPE http_request_duration_seconds histogram" in lines
+    assert any(line.startswith('http_request_duration_seconds_count{method="GET",route="/health/live",status="200"} ')
+               for line in lines)
+    assert any(line.startswith('http_request_duration_seconds_count{method="GET",route="unmatched",status="404"} ')
+               for line in lines)
+    assert "http_requests_in_flight 1" in lines
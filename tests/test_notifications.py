@@ -0,0 +1,88 @@
+import asyncio
+import uuid
+
+import pytest
+from sqlalchemy import text
+
+from src.core import settings
+from src.crud import database
+from src.crud.notifications import MAX_PAYLOAD_BYTES, Notifications, notify
+
+pytestmark = pytest.mark.anyio
+
+CHANNEL = "test_notifications"
+APPLICATION_NAME = "test-notifications-listener"
+
+
+class Listener(Notifications):
+    def __init__(self):
+        super().__init__(settings.db, application_name=APPLICATION_NAME)
+        self.received: list[str] = []
+        self.connects = 0
+        self.listen(CHANNEL, self.received.append, on_connect=self.count_connect)
+
+    def count_connect(self) -> None:
+        self.connects += 1
+
+
+@pytest.fixture
+async def listener():
+    notifications = Listener()
+    task = asyncio.create_task(notifications.run())
+    await asyncio.wait_for(notifications.connected.wait(), 5)
+    yield notifications
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    await database.engine.dispose()
+
+
+async def received(notifications: Listener, count: int) -> list[str]:
+    for _ in range(100):
+        if len(notifications.received) >= count:
+            break
+        await asyncio.sleep(0.01)
+    return notifications.received
+
+
+async def test_delivered_on_commit_only(listener):
+    ids = [str(uuid.uuid4()) for _ in range(3)]
+    async with database.async_session_factory() as session:
+        await notify(session, CHANNEL, ids)
+        await asyncio.sleep(0.1)
+        assert listener.received == []
+        await session.commit()
+    assert await received(listener, 1) == [",".join(ids)]
+
+    async with database.async_session_factory() as session:
+        await notify(session, CHANNEL, ids)
+        await session.rollback()
+    await asyncio.sleep(0.1)
+    assert len(listener.received) == 1
+
+
+async def test_long_lists_are_split(listener):
+    ids = [str(uuid.uuid4()) for _ in range(1000)]
+    async with database.async_session_factory() as session:
+        await notify(session, CHANNEL, ids)
+        await session.commit()
+    payloads = await received(listener, 5)
+    assert all(len(payload) <= MAX_PAYLOAD_BYTES for payload in payloads)
+    assert [item for payload in payloads for item in payload.split(",")] == ids
+
+
+async def test_reconnects(listener):
+    async with database.engine.connect() as connection:
+        await connection.execute(
+            text("SELECT pg_terminate_backend(pid) FROM pg_stat_activity WHERE application_name = :name"),
+            {"name": APPLICATION_NAME},
+        )
+    for _ in range(300):
+        if listener.connects == 2 and listener.connected.is_set():
+            break
+        await asyncio.sleep(0.01)
+    assert listener.connects == 2
+
+    async with database.async_session_factory() as session:
+        await notify(session, CHANNEL, ["after reconnect"])
+        await session.commit()
+    assert await received(listener, 1) == ["after reconnect"]
@@ -0,0 +1,99 @@
+"""Read routing against the database from .env, used as primary and, under other DSNs, as replicas.
+
+Every engine connects with its own application_name, so a query shows which one served it.
+"""
+import asyncio
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from src.core import settings
+from src.crud import database
+from src.crud.database import engine_options
+from src.crud.replicas import ReplicaRouter
+from src.crud.unit_of_work import connect_read_session
+
+pytestmark = pytest.mark.anyio
+
+PRIMARY = settings.db.APPLICATION_NAME or settings.api.SERVICE_SLUG
+
+
+def replica_engine(name: str, port: int | None = None) -> AsyncEngine:
+    dsn = settings.db.as_dns()
+    if port is not None:
+        dsn = dsn.replace(f":{settings.db.PORT}/", f":{port}/")
+    return create_async_engine(
+        dsn, **engine_options(settings.db, application_name=name),
+    ).execution_options(postgresql_readonly=True)
+
+
+@pytest.fixture
+async def replicas():
+    # Port 1 refuses connections, like a replica that is down
+    engines = {name: replica_engine(name, port) for name, port in (
+        ("test-replica-0", None), ("test-replica-1", None), ("test-replica-dead", 1),
+    )}
+    yield engines
+    # Every test runs in its own event loop, so no connection may outlive it
+    for engine in [*engines.values(), database.engine]:
+        await engine.dispose()
+
+
+def use_router(monkeypatch, replicas: list[AsyncEngine], eject_seconds: float = 30.0,
+               read_your_writes_seconds: float = 0.0) -> ReplicaRouter:
+    router = ReplicaRouter(database.engine, replicas, eject_seconds=eject_seconds,
+                           read_your_writes_seconds=read_your_writes_seconds)
+    monkeypatch.setattr(database, "replica_router", router, raising=False)
+    return router
+
+
+async def served_by(caller: str | None = None) -> str:
+    async with await connect_read_session(caller) as session:
+        return (await session.execute(text("SELECT current_setting('application_name')"))).scalar_one()
+
+
+async def test_round_robin(monkeypatch, replicas):
+    router = use_router(monkeypatch, [replicas["test-replica-0"], replicas["test-replica-1"]])
+
+    assert [await served_by() for _ in range(4)] == ["test-replica-0", "test-replica-1"] * 2
+    assert router.selections == [2, 2]
+    assert router.primary_selections == 0
+
+
+async def test_dead_replica_is_ejected(monkeypatch, replicas):
+    router = use_router(monkeypatch, [replicas["test-replica-dead"], replicas["test-replica-1"]])
+
+    assert [await served_by() for _ in range(3)] == ["test-replica-1"] * 3
+    assert router.selections == [1, 3]
+    assert [replica["healthy"] for replica in router.status()["replicas"]] == [False, True]
+
+
+async def test_reads_go_to_primary_without_live_replicas(monkeypatch, replicas):
+    router = use_router(monkeypatch, [replicas["test-replica-dead"]])
+
+    assert await served_by() == PRIMARY
+    assert await served_by() == PRIMARY
+    # Ejected by the first failure, so the second read does not try it again
+    assert router.selections == [1]
+    assert router.primary_selections == 2
+
+
+async def test_ejection_expires(monkeypatch, replicas):
+    router = use_router(monkeypatch, [replicas["test-replica-0"]], eject_seconds=0.2)
+
+    router.eject(0)
+    assert await served_by() == PRIMARY
+    await asyncio.sleep(0.25)
+    assert await served_by() == "test-replica-0"
+
+
+async def test_read_your_writes_window(monkeypatch, replicas):
+    router = use_router(monkeypatch, [replicas["test-replica-0"]], read_your_writes_seconds=0.3)
+
+    router.mark_write("Bearer writer")
+    assert await served_by("Bearer writer") == PRIMARY
+    assert await served_by("Bearer reader") == "test-replica-0"
+    assert await served_by(None) == "test-replica-0"
+    await asyncio.sleep(0.35)
+    assert await served_by("Bearer writer") == "test-replica-0"
@@ -0,0 +1,52 @@
+import pickle
+import uuid
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+import pytest
+
+from src.core.result_cache import MemoryCacheBackend, ResultCache
+
+pytestmark = pytest.mark.anyio
+
+
+class Exploit:
+    ran = False
+
+    def __reduce__(self):
+        return setattr, (Exploit, "ran", True)
+
+
+@pytest.fixture
+def cache() -> ResultCache:
+    return ResultCache(MemoryCacheBackend(max_size=100, ttl=30), ttl=30)
+
+
+async def test_rows_round_trip(cache):
+    rows = [{
+        "id": uuid.uuid4(),
+        "title": "t",
+        "created_at": datetime.now(timezone.utc),
+        "day": date.today(),
+        "share": Decimal("0.25"),
+        "updated_at": None,
+        "count": 3,
+    }]
+    entry_key, cached = await cache.get("blog", "scope", "query")
+    assert cached is None
+    await cache.set(entry_key, rows)
+    _, cached = await cache.get("blog", "scope", "query")
+    assert cached == rows
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+async def test_undecodable_entry_is_a_miss(cache):
+    entry_key, _ = await cache.get("blog", "scope", "query")
+    await cache.backend.set(entry_key, pickle.dumps([Exploit()]))
+    _, cached = await cache.get("blog", "scope", "query")
+    assert cached is None
+    assert not Exploit.ran
+
+    await cache.backend.set(entry_key, b"not json")
+    assert (await cache.get("blog", "scope", "query"))[1] is None
+    assert (cache.hits, cache.misses, cache.errors) == (0, 3, 0)
@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+from sqlalchemy import ColumnElement, select
+from sqlalchemy.ext.compiler import compiles
+
+from src.core.singleflight import SingleFlight
+from src.crud import database
+from src.crud.models import BlogModel
+from src.crud.repo.base import BaseRepository
+
+pytestmark = pytest.mark.anyio
+
+
+class Call:
+    """A call that finishes when released and, like a query on a session, takes a while to wind down."""
+
+    def __init__(self, result: str, wind_down: float = 0.05):
+        self.result = result
+        self.wind_down = wind_down
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+        self.runs = 0
+        self.cancelled = False
+
+    async def __call__(self) -> str:
+        self.runs += 1
+        self.started.set()
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled = True
+            await asyncio.sleep(self.wind_down)
+            raise
+        return self.result
+
+
+async def test_followers_share_the_call():
+    flights = SingleFlight()
+    call = Call("rows")
+    leader = asyncio.create_task(flights.do("key", call))
+    await call.started.wait()
+    followers = [asyncio.create_task(flights.do("key", call)) for _ in range(3)]
+    await asyncio.sleep(0)
+    call.release.set()
+    assert await leader == ("rows", False)
+    assert [await follower for follower in followers] == [("rows", True)] * 3
+    assert call.runs == 1
+    assert (flights.calls, flights.shared, len(flights)) == (1, 3, 0)
+
+
+async def test_cancelled_leader_without_followers_cancels_the_call():
+    flights = SingleFlight()
+    call = Call("stale")
+    leader = asyncio.create_task(flights.do("key", call))
+    await call.started.wait()
+    leader.cancel()
+    await asyncio.sleep(0.01)
+    # The cancelled call is still winding down, but no longer in flight
+    assert call.cancelled and not leader.done()
+    assert len(flights) == 0
+    fresh = Call("fresh")
+    fresh.release.set()
+    assert await flights.do("key", fresh) == ("fresh", False)
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+
+
+async def test_cancelled_leader_with_followers_lets_the_call_finish():
+    flights = SingleFlight()
+    call = Call("rows")
+    leader = asyncio.create_task(flights.do("key", call))
+    await call.started.wait()
+    follower = asyncio.create_task(flights.do("key", call))
+    await asyncio.sleep(0)
+    leader.cancel()
+    await asyncio.sleep(0.01)
+    assert not call.cancelled
+    call.release.set()
+    assert await follower == ("rows", True)
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+    assert len(flights) == 0
+
+
+async def test_cancelled_follower_leaves_the_call_running():
+    flights = SingleFlight()
+    call = Call("rows")
+    leader = asyncio.create_task(flights.do("key", call))
+    await call.started.wait()
+    follower = asyncio.create_task(flights.do("key", call))
+    await asyncio.sleep(0)
+    follower.cancel()
+    await asyncio.sleep(0)
+    call.release.set()
+    assert await leader == ("rows", False)
+    assert follower.cancelled() and not call.cancelled
+
+
+class Uncacheable(ColumnElement):
+    # Without inherit_cache SQLAlchemy cannot build a cache key for statements using it
+    pass
+
+
+@compiles(Uncacheable)
+def compile_uncacheable(element, compiler, **kwargs):
+    return "1"
+
+
+async def test_query_without_cache_key_is_not_shared():
+    async with database.async_session_factory() as session:
+        repo = BaseRepository(BlogModel, session)
+        assert repo.flight_key_of(select(BlogModel).where(BlogModel.title == "a")) is not None
+        with pytest.warns(Warning, match="cache key"):
+            assert repo.flight_key_of(select(BlogModel.id, Uncacheable())) is None
@@ -0,0 +1,40 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import exc
+
+import main
+from src.core import settings
+from src.crud import database
+from src.crud.warmup import warm_up
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def engine():
+    yield database.engine
+    await database.engine.dispose()
+
+
+async def test_connections_capped_at_pool_capacity(engine):
+    pool_size, max_overflow = settings.db.pool_limits(settings.run.WORKERS or 1)
+    # More than the pool gives out would wait for DB__POOL_TIMEOUT and fail
+    await asyncio.wait_for(warm_up(pool_size + max_overflow + 5), 10)
+    assert engine.pool.checkedin() == pool_size
+
+
+async def test_ready_after_a_failed_warm_up(monkeypatch):
+    attempts = []
+
+    async def flaky_warm_up(connections: int | None) -> None:
+        attempts.append(connections)
+        if len(attempts) == 1:
+            raise exc.TimeoutError("QueuePool limit reached, connection timed out")
+
+    monkeypatch.setattr(main, "warm_up", flaky_warm_up)
+    app = SimpleNamespace(state=SimpleNamespace(ready=False))
+    await asyncio.wait_for(main.warm_up_until_ready(app), 5)
+    assert len(attempts) == 2
+    assert app.state.ready